@@ -9,32 +9,21 @@ quest is to recover a magic crown
 
 __author__ = 'justinarmstrong'
 
+import argparse
 import os
 import sys
+import time
 import pygame as pg
 import yaml
 
-from data.main import main
-from data.constants import ORIGINAL_CAPTION
+from data.main import make_control
+from data.constants import FPS, ORIGINAL_CAPTION
+from data import (assetpack, graphics, replay, savefile, saving, session,
+                  tools)
+from data.pytmx import tmxloader
 
 import data.setup as setup
 
-def load_all_gfx(directory,
-                 colorkey=(255, 0, 255),
-                 accept=('.png', 'jpg', 'bmp')):
-    graphics = {}
-    for pic in os.listdir(directory):
-        name, ext = os.path.splitext(pic)
-        if ext.lower() in accept:
-            img = pg.image.load(os.path.join(directory, pic))
-            if img.get_alpha():
-                img = img.convert_alpha()
-            else:
-                img = img.convert()
-                img.set_colorkey(colorkey)
-            graphics[name] = img
-    return graphics
-
 class Mixer(object):
     """
     remote for handling pygame.mixer globally instead of keeping local state
@@ -76,9 +65,35 @@ def load_all_sfx(directory, accept=('.wav', '.mp3', '.ogg', '.mdi')):
             effects[name] = pg.mixer.Sound(os.path.join(directory, sound_fx))
     return effects
 
-if __name__ == '__main__':
+def init_game(headless=False, draw=True, virtual_time=False, seed=None,
+              save_dir=savefile.SAVE_DIR):
+    """
+    Initialize pygame and register the resources in 'setup', a game
+    session with the random seed 'seed' (a random one if None) and the
+    save slots in 'save_dir'
+
+    A headless game has no window and no sound (the SDL dummy drivers) and
+    runs on a tools.VirtualClock as fast as it can; with 'draw' off the
+    states skip drawing too.  With 'virtual_time' a game in a window runs
+    on a VirtualClock too, at the normal speed.
+
+    """
+
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        setup.register_clock(tools.VirtualClock())
+        setup.register_drawing(draw)
+    else:
+        os.environ['SDL_VIDEO_CENTERED'] = '1'
+        if virtual_time:
+            setup.register_clock(tools.VirtualClock(real_time=True))
+
+    setup.register_session(session.Session(seed))
+    slots = savefile.SaveSlots(save_dir)
+    setup.register_save_slots(slots)
+    setup.register_saver(saving.SaveService(slots.write))
 
-    os.environ['SDL_VIDEO_CENTERED'] = '1'
     pg.init()
     pg.event.set_allowed([pg.KEYDOWN, pg.KEYUP, pg.QUIT])
     pg.display.set_caption(ORIGINAL_CAPTION)
@@ -97,7 +112,13 @@ if __name__ == '__main__':
                          accept=('.tmx'))
     setup.register_tmx(TMX)
 
-    GFX = load_all_gfx(os.path.join('resources', 'graphics'))
+    # baked images and map tiles, if 'python -m data.assetpack' was run
+    PACK = assetpack.load_pack()
+    tmxloader.use_asset_pack(PACK)
+
+    # loaded on first use, or ahead of the states by a prefetch thread
+    GFX = graphics.Graphics(os.path.join('resources', 'graphics'),
+                            pack=PACK)
     setup.register_gfx(GFX)
 
     SFX = load_all_sfx(os.path.join('resources', 'sound'))
@@ -118,6 +139,72 @@ if __name__ == '__main__':
         YAML = yaml.safe_load(yaml_file)
         setup.register_yaml(YAML)
 
-    main()
+def parse_args():
+    parser = argparse.ArgumentParser(description=ORIGINAL_CAPTION)
+    parser.add_argument('--headless', action='store_true',
+                        help='run without a window, sound or frame limit')
+    parser.add_argument('--no-draw', action='store_true',
+                        help='skip drawing (headless only)')
+    parser.add_argument('--frames', type=int,
+                        help='stop after this many frames')
+    parser.add_argument('--record', metavar='FILE',
+                        help='record the keyboard input to a replay file')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='play a replay file back (at full speed with '
+                             '--headless)')
+    parser.add_argument('--frame-times', metavar='FILE',
+                        help='write the time of every frame (s) to a file')
+    parser.add_argument('--saves', metavar='DIR', default=savefile.SAVE_DIR,
+                        help='directory of the save slots')
+    parser.add_argument('--warm-up', action='store_true',
+                        help='make the states the game may go to next '
+                             'ahead of time')
+    parser.add_argument('--log-states', action='store_true',
+                        help='print how long making each state takes')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+
+    args = parse_args()
+
+    # a replay runs with the random seed of the recording
+    replayer = None
+    seed = None
+    if args.replay:
+        replayer = replay.Replayer(args.replay)
+        seed = replayer.seed
+
+    init_game(args.headless, draw=not args.no_draw,
+              virtual_time=bool(args.record or args.replay), seed=seed,
+              save_dir=args.saves)
+    setup.save_slots().migrate_legacy(savefile.LEGACY_SAVE)
+
+    control = make_control(args.warm_up, args.log_states)
+    control.replayer = replayer
+    if args.record:
+        control.recorder = replay.Recorder(args.record,
+                                           setup.session().seed, FPS)
+    if args.replay or args.frame_times:
+        control.frame_times = []
+
+    start = time.perf_counter()
+    control.main(args.frames)
+    if args.headless:
+        elapsed = time.perf_counter() - start
+        print('{0} frames in {1:.2f} s ({2:.0f} frames/s)'.format(
+            control.frame_count, elapsed, control.frame_count / elapsed))
+
+    # the last save may still be on its way to the disk
+    setup.saver().flush()
+
+    if control.recorder is not None:
+        control.recorder.save()
+    if control.frame_times is not None:
+        print(replay.frame_time_report(control.frame_times))
+        if args.frame_times:
+            with open(args.frame_times, 'w') as times_file:
+                times_file.writelines('{0!r}\n'.format(frame_time)
+                                      for frame_time in control.frame_times)
+
     pg.quit()
     sys.exit()
@@ -0,0 +1,599 @@
+#!/usr/bin/env python
+
+"""
+
+Timing of the loading and rendering paths of the game
+
+Run one benchmark by name, e.g. "python benchmark.py mapcache", or all of
+them with no arguments.
+
+"""
+
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import pygame as pg
+
+from data.pytmx import cache, pytmx, tmxloader
+from data import (assetpack, collision, graphics, pathfinding, savefile,
+                  saving, session, setup, tilerender, tools)
+from data.components import crowd, person
+
+TMX_DIR = os.path.join('resources', 'tmx')
+
+
+def tmx_files():
+    return sorted(os.path.join(TMX_DIR, name)
+                  for name in os.listdir(TMX_DIR) if name.endswith('.tmx'))
+
+
+def init_display():
+    """ Set up a display so surfaces can be converted, without a window """
+    if not pg.display.get_init():
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pg.display.init()
+        pg.display.set_mode((800, 608))
+
+
+def best_of(function, repeat=5, number=20):
+    """ Best time of one call to 'function', in milliseconds """
+    timer = timeit.Timer(function, timer=time.perf_counter)
+    return min(timer.repeat(repeat, number)) / number * 1000
+
+
+def bench_mapcache():
+    """
+    Parse time of every map: XML parsing (cold cache) against reading the
+    pickled map back (warm cache)
+    """
+
+    print('{0:<20}{1:>12}{2:>12}{3:>10}'.format(
+        'map', 'cold (ms)', 'warm (ms)', 'speedup'))
+
+    total_cold = total_warm = 0
+    for filename in tmx_files():
+        cold = best_of(lambda: pytmx.TiledMap(filename))
+        cache.store(pytmx.TiledMap(filename))
+        warm = best_of(lambda: cache.load_cached(filename))
+        total_cold += cold
+        total_warm += warm
+        print('{0:<20}{1:>12.3f}{2:>12.3f}{3:>9.1f}x'.format(
+            os.path.basename(filename), cold, warm, cold / warm))
+
+    print('{0:<20}{1:>12.3f}{2:>12.3f}{3:>9.1f}x'.format(
+        'total', total_cold, total_warm, total_cold / total_warm))
+
+
+def bench_tilecache():
+    """
+    Image loading of every map with an empty tile cache against loading it
+    again with the tiles of all maps already converted
+    """
+
+    init_display()
+
+    def load_all():
+        for filename in tmx_files():
+            tmxloader.load_pygame(filename, pixelalpha=True)
+
+    def load_all_cold():
+        tmxloader.TILE_CACHE.clear()
+        load_all()
+
+    cold = best_of(load_all_cold, number=3)
+    load_all()
+    warm = best_of(load_all, number=3)
+
+    print('all maps, cold tile cache: {0:8.3f} ms'.format(cold))
+    print('all maps, warm tile cache: {0:8.3f} ms'.format(warm))
+    print(tmxloader.TILE_CACHE.stats())
+
+
+def bench_mapsurface():
+    """
+    Building the 2x level surface of every map, rendering the tiles (cold
+    map cache) against taking it from tilerender.MAP_CACHE (warm)
+    """
+
+    init_display()
+
+    def enter(filename):
+        tilerender.Renderer(filename).make_2x_map()
+
+    print('{0:<20}{1:>12}{2:>12}'.format('map', 'cold (ms)', 'warm (ms)'))
+
+    for filename in tmx_files():
+        def enter_cold():
+            tilerender.MAP_CACHE.clear()
+            enter(filename)
+
+        cold = best_of(enter_cold, number=5)
+        warm = best_of(lambda: enter(filename), number=5)
+        print('{0:<20}{1:>12.3f}{2:>12.3f}'.format(
+            os.path.basename(filename), cold, warm))
+
+    print(tilerender.MAP_CACHE.stats())
+
+
+def bench_tileblits():
+    """
+    Rendering every map at 1x: one blit call per tile, looking up each gid
+    (the old Renderer.render), against the compiled per layer Surface.blits
+    sequences, compiling them (cold) or taken from tilerender.BLIT_CACHE
+    (warm)
+    """
+
+    init_display()
+
+    def blit_tiles(renderer, surface):
+        tmx_data = renderer.tmx_data
+        for layer in tmx_data.visible_layers:
+            if isinstance(layer, pytmx.TiledLayer):
+                for x, y, gid in layer.iter_tiles():
+                    tile = tmx_data.get_tile_image_by_gid(gid)
+                    if tile:
+                        surface.blit(tile, (x * tmx_data.tilewidth,
+                                            y * tmx_data.tileheight))
+
+    print('{0:<20}{1:>14}{2:>12}{3:>12}{4:>10}'.format(
+        'map', 'per tile (ms)', 'cold (ms)', 'warm (ms)', 'speedup'))
+
+    for filename in tmx_files():
+        renderer = tilerender.Renderer(filename)
+        surface = pg.Surface(renderer.size)
+
+        def render_cold():
+            tilerender.BLIT_CACHE.clear()
+            renderer.render(surface)
+
+        per_tile = best_of(lambda: blit_tiles(renderer, surface))
+        cold = best_of(render_cold)
+        warm = best_of(lambda: renderer.render(surface))
+        print('{0:<20}{1:>14.3f}{2:>12.3f}{3:>12.3f}{4:>9.1f}x'.format(
+            os.path.basename(filename), per_tile, cold, warm,
+            per_tile / warm))
+
+    print(tilerender.BLIT_CACHE.stats())
+
+
+def bench_levelframe():
+    """
+    Drawing one level frame, map and sprites, through a map-sized level
+    surface (the old LevelState.draw_level) against drawing straight to the
+    screen moved by the camera offset (the current one)
+    """
+
+    init_display()
+    screen = pg.display.get_surface()
+
+    sprite = pg.Surface((32, 32))
+    sprite.set_colorkey((0, 0, 0))
+    sprite.fill((200, 40, 40), (8, 4, 16, 26))
+
+    print('{0:<20}{1:>16}{2:>12}{3:>10}'.format(
+        'map', 'surface (ms)', 'direct (ms)', 'speedup'))
+
+    for filename in tmx_files():
+        level = tilerender.Renderer(filename).make_2x_chunks()
+        level_rect = level.get_rect()
+        viewport = screen.get_rect(center=level_rect.center)
+        viewport.clamp_ip(level_rect)
+        sprite_rects = [
+            sprite.get_rect(x=viewport.x + 37 * i % viewport.width,
+                            y=viewport.y + 53 * i % viewport.height)
+            for i in range(20)]
+
+        # the level surface was made once per level entry
+        level_surface = pg.Surface(level_rect.size).convert()
+
+        def through_surface():
+            level.draw(level_surface, viewport)
+            for rect in sprite_rects:
+                level_surface.blit(sprite, rect)
+            screen.blit(level_surface, (0, 0), viewport)
+
+        def direct():
+            offset = (-viewport.x, -viewport.y)
+            level.draw(screen, viewport, (0, 0))
+            for rect in sprite_rects:
+                screen.blit(sprite, rect.move(offset))
+
+        old = best_of(through_surface)
+        new = best_of(direct)
+        print('{0:<20}{1:>16.3f}{2:>12.3f}{3:>9.1f}x'.format(
+            os.path.basename(filename), old, new, old / new))
+
+
+class Walker(pg.sprite.Sprite):
+    """ The parts of a Person the CollisionHandler uses """
+
+    def __init__(self, x, y):
+        super(Walker, self).__init__()
+        self.rect = pg.Rect(x, y, 32, 32)
+        # what set_blockers made every frame, for the old checks
+        self.blockers = [self.rect.copy()]
+        self.wander_box = [pg.Rect(x + dx * 32, y + dy * 32, 32, 32)
+                           for dx in range(-3, 4) for dy in (-3, 3)]
+        self.x_vel = self.y_vel = 0
+
+    def begin_resting(self):
+        self.x_vel = self.y_vel = 0
+
+    begin_auto_resting = begin_resting
+
+
+def bench_collision():
+    """
+    Collision checks on a synthetic 200x200 tile map with thousands of
+    blockers and a crowd of sprites: testing every blocker rect (the old
+    CollisionHandler) against the SpatialHash and TileReservations lookups
+    """
+
+    class Level(object):
+        pass
+
+    def blocker_list(level):
+        blockers = list(level.blockers)
+        for sprite in level.sprites:
+            blockers.extend(sprite.blockers)
+        return blockers
+
+    def check_every_rect(level):
+        blockers = blocker_list(level)
+        any(level.player.rect.colliderect(blocker) for blocker in blockers)
+        for sprite in level.sprites:
+            for blocker in level.blockers:
+                sprite.rect.colliderect(blocker)
+            sprite.rect.colliderect(level.player.rect)
+            sprite.kill()
+            pg.sprite.spritecollideany(sprite, level.sprites)
+            level.sprites.add(sprite)
+            for blocker in sprite.wander_box:
+                sprite.rect.colliderect(blocker)
+
+    print('{0:>10}{1:>10}{2:>16}{3:>12}{4:>10}'.format(
+        'blockers', 'sprites', 'every rect (ms)', 'grid (ms)', 'speedup'))
+
+    for blocker_count, sprite_count in ((1000, 10), (5000, 50),
+                                        (20000, 200)):
+        rand = random.Random(blocker_count)
+        tiles = rand.sample([(x, y) for x in range(200) for y in range(200)],
+                            blocker_count + sprite_count + 1)
+
+        level = Level()
+        level.blockers = [pg.Rect(x * 32, y * 32, 32, 32)
+                          for x, y in tiles[:blocker_count]]
+        level.sprites = pg.sprite.Group(
+            [Walker(x * 32, y * 32) for x, y in tiles[blocker_count:-1]])
+        level.player = Walker(tiles[-1][0] * 32, tiles[-1][1] * 32)
+        level.portals = pg.sprite.Group()
+        handler = collision.CollisionHandler(level)
+
+        old = best_of(lambda: check_every_rect(level), number=5)
+        new = best_of(handler.check_for_blockers, number=5)
+        print('{0:>10}{1:>10}{2:>16.3f}{3:>12.3f}{4:>9.1f}x'.format(
+            blocker_count, sprite_count, old, new, old / new))
+
+
+def wandering_level(sprite_count, seed):
+    """
+    A synthetic 100x100 tile level with 1000 blockers and 'sprite_count'
+    villagers wandering about, with what the CollisionHandler and a
+    crowd.Crowd use of a LevelState
+    """
+
+    class Level(object):
+        pass
+
+    rand = random.Random(seed)
+    tiles = rand.sample([(x, y) for x in range(100) for y in range(100)],
+                        1000 + sprite_count + 1)
+
+    level = Level()
+    level.blockers = [pg.Rect(x * 32, y * 32, 32, 32)
+                      for x, y in tiles[:1000]]
+    level.sprites = pg.sprite.Group(
+        [person.Person('femvillager2', (x * 32, y * 32), 'autoresting')
+         for x, y in tiles[1000:-1]])
+    level.awake_sprites = pg.sprite.Group(level.sprites)
+    level.player = Walker(tiles[-1][0] * 32, tiles[-1][1] * 32)
+    level.player.state = 'resting'
+    level.portals = pg.sprite.Group()
+    level.reservations = collision.TileReservations(level.sprites)
+    return level
+
+
+def check_wanderers(level):
+    """
+    Raise AssertionError if two sprites of 'level' overlap or a resting
+    one is between two tiles
+    """
+    taken = {}
+    for sprite in level.sprites:
+        assert sprite.rect.collidelist(list(taken.values())) == -1, \
+            'sprites overlap at {0}'.format(sprite.rect)
+        taken[sprite] = sprite.rect.copy()
+        if sprite.state == 'autoresting':
+            assert sprite.rect.x % 32 == 0 and sprite.rect.y % 32 == 0, \
+                'resting between tiles at {0}'.format(sprite.rect)
+
+
+def bench_crowd():
+    """
+    Wandering villagers on a synthetic level, all of them awake: stepped
+    one by one (Person.update and the CollisionHandler) against together
+    in a crowd.Crowd, for as many frames as a few rests and walks take.
+    Both end up checked for overlapping or misplaced sprites, so the crowd,
+    which no shipped map has enough villagers for, is run here.
+    """
+    if crowd.np is None:
+        print('no numpy, no crowd')
+        return
+
+    init_display()
+    setup.register_gfx(graphics.Graphics(os.path.join('resources',
+                                                      'graphics')))
+    frames = 600
+
+    def run(sprite_count, step, make):
+        clock = tools.VirtualClock()
+        setup.register_clock(clock)
+        setup.register_session(session.Session(0))
+        level = wandering_level(sprite_count, sprite_count)
+        make(level)
+        start = time.perf_counter()
+        moving = 0
+        for _ in range(frames):
+            clock.tick()
+            step(level)
+            moving += sum(sprite.state == 'automoving'
+                          for sprite in level.sprites)
+        elapsed = (time.perf_counter() - start) / frames * 1000
+        check_wanderers(level)
+        return elapsed, moving
+
+    def make_handler(level):
+        level.collision_handler = collision.CollisionHandler(level)
+
+    def one_by_one(level):
+        level.awake_sprites.update()
+        level.collision_handler.update()
+
+    def make_crowd(level):
+        level.crowd = crowd.Crowd(level.sprites, level)
+
+    def together(level):
+        level.crowd.update(area)
+
+    print('{0:>10}{1:>14}{2:>12}{3:>10}{4:>18}'.format(
+        'sprites', 'persons (ms)', 'crowd (ms)', 'speedup',
+        'walking frames'))
+
+    area = pg.Rect(0, 0, 3200, 3200)
+    try:
+        for sprite_count in (32, 200, 1000):
+            old, old_moving = run(sprite_count, one_by_one, make_handler)
+            new, new_moving = run(sprite_count, together, make_crowd)
+            print('{0:>10}{1:>14.3f}{2:>12.3f}{3:>9.1f}x{4:>18}'.format(
+                sprite_count, old, new, old / new,
+                '{0}/{1}'.format(old_moving, new_moving)))
+    finally:
+        setup.register_clock(None)
+
+
+def bench_pathfinding():
+    """
+    Path requests on a synthetic 200x200 tile map: A* searches with an
+    empty pathfinding.PATH_CACHE (cold) against the same requests answered
+    from it (warm), as when many NPCs walk between the same places
+    """
+
+    print('{0:>10}{1:>10}{2:>12}{3:>12}{4:>10}'.format(
+        'blockers', 'requests', 'cold (ms)', 'warm (ms)', 'speedup'))
+
+    for blocker_count, request_count in ((2000, 20), (8000, 100)):
+        rand = random.Random(blocker_count)
+        tiles = rand.sample([(x, y) for x in range(200) for y in range(200)],
+                            blocker_count + request_count * 2)
+        blockers = [pg.Rect(x * 32, y * 32, 32, 32)
+                    for x, y in tiles[:blocker_count]]
+        ends = tiles[blocker_count:]
+        requests = list(zip(ends[::2], ends[1::2]))
+        finder = pathfinding.Pathfinder('bench', (6400, 6400), blockers)
+
+        def find_all():
+            for start, goal in requests:
+                finder.find(start, goal)
+
+        def find_all_cold():
+            pathfinding.PATH_CACHE.clear()
+            find_all()
+
+        cold = best_of(find_all_cold, number=3)
+        find_all()
+        warm = best_of(find_all, number=3)
+        print('{0:>10}{1:>10}{2:>12.3f}{3:>12.3f}{4:>9.1f}x'.format(
+            blocker_count, request_count, cold, warm, cold / warm))
+
+    print(pathfinding.PATH_CACHE.stats())
+
+
+def bench_graphics():
+    """
+    Loading every image of resources/graphics before the first frame, as
+    the game did, against what the title screen needs from a lazy
+    graphics.Graphics; then the rest, decoded on the prefetch thread and
+    converted as they are looked up
+    """
+    init_display()
+    directory = os.path.join('resources', 'graphics')
+
+    def load_all():
+        every = graphics.Graphics(directory)
+        for name in every:
+            every[name]
+
+    def load_title():
+        graphics.Graphics(directory)['title_box']
+
+    every = best_of(load_all, number=3)
+    title = best_of(load_title, number=3)
+    lazy = graphics.Graphics(directory)
+    start = time.perf_counter()
+    lazy.prefetch(list(lazy))
+    lazy.wait()
+    prefetch = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for name in lazy:
+        lazy[name]
+    convert = (time.perf_counter() - start) * 1000
+
+    print('every image {0:.3f} ms, the title screen {1:.3f} ms, the rest '
+          'prefetched in {2:.3f} ms and converted in {3:.3f} ms'.format(
+              every, title, prefetch, convert))
+    slowest = sorted(lazy.load_times.items(), key=lambda item: -item[1][0])
+    for name, (seconds, _) in slowest[:3]:
+        print('  {0:<16}{1:>8.3f} ms'.format(name, seconds * 1000))
+
+
+def saved_game_data():
+    """ The game data of a game some way in: items bought, quests begun """
+    game_data = tools.new_game_data()
+    inventory = game_data['player inventory']
+    inventory['Long Sword'] = {'quantity': 1, 'value': 150, 'power': 11}
+    inventory['Chain Mail'] = {'quantity': 1, 'value': 50, 'power': 2}
+    inventory['Cure'] = {'magic points': 25, 'power': 50}
+    inventory['equipped weapon'] = 'Long Sword'
+    inventory['equipped armor'].append('Chain Mail')
+    inventory['GOLD']['quantity'] = 1234
+    game_data['player stats']['Level'] = 4
+    game_data['last location'] = [17.0, 34.0]
+    game_data['last state'] = 'Inn'
+    game_data['talked to king'] = True
+    game_data['treasure3'] = False
+    game_data['brother elixir'] = True
+    return game_data
+
+
+def bench_savefile():
+    """
+    Saving and loading the game data: the save file format (savefile)
+    against the pickled save.p it replaced; encoding alone, and writing
+    the file for good (fsync and rename) as the save thread does.  Then
+    listing the save slots from the index against loading every slot.
+    """
+
+    game_data = saved_game_data()
+    pickled = pickle.dumps(game_data, pickle.HIGHEST_PROTOCOL)
+    saved = savefile.dumps(game_data)
+    assert savefile.loads(saved) == game_data
+
+    directory = tempfile.mkdtemp(prefix='bench-')
+    try:
+        slots = savefile.SaveSlots(directory)
+        for slot in range(1, savefile.SLOTS + 1):
+            slots.write(slot, game_data)
+        pickle_path = os.path.join(directory, 'save.p')
+
+        def load_pickle():
+            with open(pickle_path, 'rb') as save_file:
+                return pickle.load(save_file)
+
+        rows = [
+            ('encode (ms)',
+             best_of(lambda: pickle.dumps(game_data, pickle.HIGHEST_PROTOCOL),
+                     number=200),
+             best_of(lambda: savefile.dumps(game_data), number=200)),
+            ('decode (ms)',
+             best_of(lambda: pickle.loads(pickled), number=200),
+             best_of(lambda: savefile.loads(saved), number=200)),
+            ('write (ms)',
+             best_of(lambda: saving.write_atomic(
+                 pickle_path, pickle.dumps(game_data,
+                                           pickle.HIGHEST_PROTOCOL))),
+             best_of(lambda: slots.write(1, game_data))),
+            ('load (ms)',
+             best_of(load_pickle),
+             best_of(lambda: slots.load(1))),
+        ]
+        print('{0:<14}{1:>12}{2:>12}'.format('', 'pickle', 'savefile'))
+        print('{0:<14}{1:>12}{2:>12}'.format('size (bytes)', len(pickled),
+                                             len(saved)))
+        for name, old, new in rows:
+            print('{0:<14}{1:>12.3f}{2:>12.3f}'.format(name, old, new))
+
+        every_slot = best_of(lambda: [slots.load(slot) for slot in
+                                      range(1, savefile.SLOTS + 1)])
+        index = best_of(lambda: savefile.SaveSlots(directory).index())
+        print('listing {0} slots: loading each {1:.3f} ms, the index '
+              '{2:.3f} ms'.format(savefile.SLOTS, every_slot, index))
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_assetpack():
+    """
+    Every image of resources/graphics and the tiles of every map: decoded
+    from the image files and converted, against made from a baked asset
+    pack (a view of the mapped file, or one copy)
+    """
+    init_display()
+    directory = os.path.join('resources', 'graphics')
+    # the pack lives next to the directories it refers to
+    filename = os.path.join('resources', 'bench-assets.pack')
+    assetpack.bake(filename)
+    pack = assetpack.AssetPack(filename)
+
+    def load_all(pack):
+        every = graphics.Graphics(directory, pack=pack)
+        for name in every:
+            every[name]
+        tmxloader.use_asset_pack(pack)
+        tmxloader.TILE_CACHE.clear()
+        for tmx in tmx_files():
+            tmxloader.load_pygame(tmx, pixelalpha=True)
+
+    try:
+        files = best_of(lambda: load_all(None), number=3)
+        packed = best_of(lambda: load_all(pack), number=3)
+        check = best_of(lambda: assetpack.load_pack(filename))
+        # the lookups of one packed load
+        pack.hits = pack.misses = 0
+        tmxloader.TILE_CACHE.hits = tmxloader.TILE_CACHE.misses = 0
+        load_all(pack)
+        tile_stats = tmxloader.TILE_CACHE.stats()
+    finally:
+        tmxloader.use_asset_pack(None)
+        tmxloader.TILE_CACHE.clear()
+        os.remove(filename)
+
+    print('image files {0:.3f} ms, asset pack {1:.3f} ms ({2:.1f}x); the '
+          'pack opened and checked in {3:.3f} ms'.format(
+              files, packed, files / packed, check))
+    print('tiles from the pack', pack.stats())
+    print(tile_stats)
+
+
+BENCHMARKS = {'assetpack': bench_assetpack,
+              'collision': bench_collision,
+              'crowd': bench_crowd,
+              'graphics': bench_graphics,
+              'levelframe': bench_levelframe,
+              'mapcache': bench_mapcache,
+              'mapsurface': bench_mapsurface,
+              'pathfinding': bench_pathfinding,
+              'savefile': bench_savefile,
+              'tileblits': bench_tileblits,
+              'tilecache': bench_tilecache}
+
+if __name__ == '__main__':
+
+    for name in sys.argv[1:] or sorted(BENCHMARKS):
+        print('== {0}'.format(name))
+        BENCHMARKS[name]()
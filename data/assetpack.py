@@ -0,0 +1,352 @@
+"""
+
+Pre-baked pixel data of every image the game draws
+
+Starting the game used to decode PNG files: every image of
+resources/graphics on its first use, and the tileset images of every map,
+which tmxloader then cuts into tiles and converts one by one.  The bake
+step does all of that once, offline, and writes what came out into one
+pack file (PACK_FILE), as the raw pixels of the surfaces:
+
+    python -m data.assetpack
+
+The pack holds the images of resources/graphics converted to the display
+format, the tileset images as they are loaded, and every converted tile of
+every map (tmxloader.TILE_CACHE after loading them all), each with its
+colorkey and alpha.  The game memory-maps the file; a surface whose pixel
+format pg.image.frombuffer knows (per-pixel alpha, the tileset images) is
+a view of the mapped file, the others (convert()ed, colorkey) are copied
+into a new surface of the display format in one go.  Nothing is decoded.
+
+The pack is only used if it was baked for the pixel format of the display
+and from the image files that are there now; otherwise the game prints why
+and loads the images itself.  Bake it again after changing an image.
+
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import pygame as pg
+
+from . import graphics
+from .pytmx import tmxloader
+
+
+# bump whenever the layout of the pack changes
+PACK_VERSION = 1
+
+PACK_FILE = os.path.join('resources', 'assets.pack')
+
+MAGIC = b'TSCP'
+
+# magic, pack version, length of the JSON index that follows
+HEADER = struct.Struct('<4sHI')
+
+# the pixels of every surface start on a multiple of this
+ALIGN = 64
+
+# pg.image.frombuffer formats, tried for surfaces that can be mapped
+BUFFER_FORMATS = ('RGBA', 'BGRA', 'ARGB', 'RGBX', 'RGB', 'BGR')
+
+
+class PackError(Exception):
+    """
+    A pack file that can't be read
+    """
+
+
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def pixel_format(surface):
+    return [surface.get_bitsize(), list(surface.get_masks())]
+
+
+def display_format():
+    """
+    The pixel formats of convert() and of convert_alpha() surfaces
+    """
+    surface = pg.Surface((1, 1))
+    return {'convert': pixel_format(surface.convert()),
+            'convert alpha': pixel_format(surface.convert_alpha())}
+
+
+def buffer_formats():
+    """
+    The frombuffer format of each pixel format it can map, by
+    (bitsize, masks)
+    """
+    formats = {}
+    for name in BUFFER_FORMATS:
+        try:
+            surface = pg.image.frombuffer(bytes(len(name)), (1, 1), name)
+        except ValueError:
+            continue
+        bitsize, masks = pixel_format(surface)
+        formats.setdefault((bitsize, tuple(masks)), name)
+    return formats
+
+
+def source_stat(path):
+    """
+    (mtime, size, crc32) of an image file
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as source:
+        crc = zlib.crc32(source.read())
+    return [stat.st_mtime_ns, stat.st_size, crc]
+
+
+def surface_entry(surface, offset, source):
+    """
+    What it takes to make 'surface' again from its pixels at 'offset'
+    """
+    flags = surface.get_flags()
+    colorkey = surface.get_colorkey()
+    return {'offset': offset,
+            'size': list(surface.get_size()),
+            'pitch': surface.get_pitch(),
+            'format': pixel_format(surface),
+            'alpha': bool(flags & pg.SRCALPHA),
+            'colorkey': list(colorkey) if colorkey else None,
+            'rle': bool(flags & (pg.RLEACCEL | pg.RLEACCELOK)),
+            'palette': ([list(color) for color in surface.get_palette()]
+                        if surface.get_bitsize() == 8 else None),
+            'source': source}
+
+
+def tile_name(key, root):
+    """
+    The name of a tmxloader.TILE_CACHE key in the pack: the same key with
+    the path of the image relative to the directory of the pack
+    """
+    path = os.path.relpath(key[0], root).replace(os.sep, '/')
+    return repr((path,) + tuple(key[1:]))
+
+
+class AssetPack(object):
+    """
+    The surfaces of a pack file, made on demand from the mapped file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.root = os.path.dirname(os.path.abspath(filename))
+        with open(filename, 'rb') as pack_file:
+            try:
+                self.map = mmap.mmap(pack_file.fileno(), 0,
+                                     access=mmap.ACCESS_COPY)
+            except ValueError:
+                raise PackError('empty file')
+
+        if len(self.map) < HEADER.size:
+            raise PackError('truncated file')
+        magic, version, length = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise PackError('not a pack file')
+        if version != PACK_VERSION:
+            raise PackError('pack version {0}, expected {1}'.format(
+                version, PACK_VERSION))
+        try:
+            self.index = json.loads(
+                self.map[HEADER.size:HEADER.size + length].decode('utf-8'))
+        except ValueError:
+            raise PackError('damaged index')
+
+        self.data = memoryview(self.map)[aligned(HEADER.size + length):]
+        self.formats = buffer_formats()
+        self.images = self.index['images']
+        self.tiles = self.index['tiles']
+        # tile lookups the pack could and couldn't answer, for reporting
+        self.hits = 0
+        self.misses = 0
+
+    def check(self):
+        """
+        Why the pack can't be used with this display and these image
+        files, or None if it can
+        """
+        if self.index['display'] != display_format():
+            return 'baked for another display pixel format'
+        for path, (mtime, size, crc) in sorted(
+                self.index['sources'].items()):
+            full_path = os.path.join(self.root, path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                return '{0} is gone'.format(path)
+            if (stat.st_mtime_ns, stat.st_size) == (mtime, size):
+                continue
+            # a fresh checkout touches every file; compare the contents
+            if source_stat(full_path)[1:] != [size, crc]:
+                return '{0} has changed'.format(path)
+        return None
+
+    def surface(self, entry):
+        """
+        The surface of a pack entry
+        """
+        width, height = entry['size']
+        bitsize, masks = entry['format']
+        pitch = entry['pitch']
+        pixels = self.data[entry['offset']:entry['offset'] + pitch * height]
+
+        name = self.formats.get((bitsize, tuple(masks)))
+        if name is not None and pitch == width * len(name):
+            surface = pg.image.frombuffer(pixels, (width, height), name)
+        else:
+            flags = pg.SRCALPHA if entry['alpha'] else 0
+            surface = pg.Surface((width, height), flags, bitsize, masks)
+            if entry['palette']:
+                surface.set_palette(entry['palette'])
+            if surface.get_pitch() == pitch:
+                view = surface.get_view('0')
+                memoryview(view).cast('B')[:] = pixels
+                del view
+            else:
+                row = min(pitch, surface.get_pitch())
+                buffer = surface.get_buffer()
+                for y in range(height):
+                    start = y * pitch
+                    buffer.write(pixels[start:start + row].tobytes(),
+                                 y * surface.get_pitch())
+                del buffer
+
+        if entry['colorkey']:
+            surface.set_colorkey(entry['colorkey'],
+                                 pg.RLEACCEL if entry['rle'] else 0)
+        return surface
+
+    def image(self, name):
+        """
+        The image 'name' of resources/graphics, converted, or None
+        """
+        entry = self.images.get(name)
+        return None if entry is None else self.surface(entry)
+
+    def tile(self, key):
+        """
+        The surface of a tmxloader.TILE_CACHE key, or None
+        """
+        entry = self.tiles.get(tile_name(key, self.root))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.surface(entry)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def load_pack(filename=PACK_FILE):
+    """
+    The AssetPack of 'filename' if it can be used, or else None; needs the
+    display mode set
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        pack = AssetPack(filename)
+        problem = pack.check()
+    except (IOError, OSError, PackError, KeyError, ValueError) as error:
+        problem = error
+    if problem is not None:
+        msg = 'Not using the asset pack {0}: {1}; run "python -m {2}"'
+        print(msg.format(filename, problem, __name__))
+        return None
+    return pack
+
+
+def bake(filename=PACK_FILE, graphics_dir=os.path.join('resources',
+                                                       'graphics'),
+         tmx_dir=os.path.join('resources', 'tmx')):
+    """
+    Load and convert every image and tile and write them into the pack
+    'filename'; returns the number of (images, tiles)
+    """
+    root = os.path.dirname(os.path.abspath(filename))
+
+    def relative(path):
+        return os.path.relpath(path, root).replace(os.sep, '/')
+
+    surfaces = []
+    images = {}
+    gfx = graphics.Graphics(graphics_dir)
+    for name in sorted(gfx.paths):
+        images[name] = len(surfaces)
+        path = gfx.paths[name]
+        surfaces.append((graphics.load_image(path, gfx.colorkey),
+                         relative(path)))
+
+    # every tile of every map, as tmxloader converts them for the game
+    tiles = {}
+    tmxloader.use_asset_pack(None)
+    for tmx in sorted(os.listdir(tmx_dir)):
+        if not tmx.endswith('.tmx'):
+            continue
+        tmxloader.TILE_CACHE.clear()
+        tmxloader.load_pygame(os.path.join(tmx_dir, tmx), pixelalpha=True)
+        for key, surface in tmxloader.TILE_CACHE.items():
+            name = tile_name(key, root)
+            if name not in tiles:
+                tiles[name] = len(surfaces)
+                surfaces.append((surface, relative(key[0])))
+    tmxloader.TILE_CACHE.clear()
+
+    entries = []
+    offset = 0
+    for surface, source in surfaces:
+        entries.append(surface_entry(surface, offset, source))
+        offset = aligned(offset + surface.get_pitch() * surface.get_height())
+
+    sources = sorted(set(source for _, source in surfaces))
+    index = {'display': display_format(),
+             'sources': dict((source,
+                              source_stat(os.path.join(root, source)))
+                             for source in sources),
+             'images': dict((name, entries[i])
+                            for name, i in images.items()),
+             'tiles': dict((name, entries[i]) for name, i in tiles.items())}
+    blob = json.dumps(index, sort_keys=True).encode('utf-8')
+
+    temp_path = filename + '.tmp'
+    with open(temp_path, 'wb') as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, PACK_VERSION, len(blob)))
+        pack_file.write(blob)
+        start = aligned(HEADER.size + len(blob))
+        for (surface, _), entry in zip(surfaces, entries):
+            pack_file.seek(start + entry['offset'])
+            pack_file.write(surface.get_buffer().raw)
+        pack_file.truncate(start + offset)
+    os.replace(temp_path, filename)
+    return len(images), len(tiles)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Bake every image and map tile into one pack file')
+    parser.add_argument('--output', metavar='FILE', default=PACK_FILE)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    args = parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pg.display.init()
+    pg.display.set_mode((800, 608))
+
+    start = time.perf_counter()
+    image_count, tile_count = bake(args.output)
+    print('{0} images and {1} tiles in {2} ({3:.0f} kB) in {4:.2f} s'.format(
+        image_count, tile_count, args.output,
+        os.path.getsize(args.output) / 1024.0,
+        time.perf_counter() - start))
@@ -0,0 +1,303 @@
+"""
+
+Monte Carlo battle balance simulator
+
+Plays a great many battles at once, without the game: one turn of every
+battle is a handful of numpy operations on arrays with one entry per
+battle.  The rules are those of Battle, with the dice of Person.calculate_hit
+and Player.calculate_hit:
+
+    the player takes one action a turn, two from level 3 on: drinking a
+    healing potion (30 health) or casting Cure when low on health, Fire
+    Blast (every enemy takes power/2 to power) when there are two enemies
+    or more and magic left, or else hitting the first enemy for weapon
+    power - 7 to weapon power;
+
+    then every enemy still standing hits the player for 0 to
+    max(1, level * 5 - armor power).
+
+Enemies have level * 4 health (the evil wizard 100), their level depends on
+where the battle is (make_enemy_level_dict).  Weapons, armor and spells are
+the ones of shops.yaml; the player starts out like tools.create_game_data_dict
+and grows like Battle levels them up.
+
+Run "python -m data.balance --help" for the options; numpy is required.
+
+"""
+
+import argparse
+import os
+import time
+
+import yaml
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import setup, tools, session
+from . import constants as c
+from .states.battle import make_enemy_level_dict
+
+SHOPS_YAML = os.path.join('resources', 'yaml', 'shops.yaml')
+
+HEALING_POTION = 30
+WIZARD_HEALTH = 100
+MAX_ENEMIES = 3
+
+# battles still going after this many turns are given up
+MAX_TURNS = 200
+
+# battles simulated together; bounds the size of the arrays
+CHUNK_SIZE = 1000000
+
+
+def load_items(filename=SHOPS_YAML):
+    """
+    Return a dict of the items of every shop of 'filename', by name
+    """
+    with open(filename) as yaml_file:
+        shops = yaml.safe_load(yaml_file)
+
+    items = {}
+    for shop_items in shops.values():
+        for item in shop_items:
+            items[item['type']] = item
+    return items
+
+
+def player_stats(level):
+    """
+    Return (health, magic) of a player of 'level' at full strength, grown
+    from the stats of a new game like Battle levels the player up
+    """
+    tools.create_game_data_dict()
+    stats = setup.game_data()['player stats']
+    health = stats['health']['maximum']
+    magic = stats['magic']['maximum']
+    for _ in range(level - 1):
+        health += int(health * .25)
+        magic += int(magic * .20)
+    return health, magic
+
+
+class Scenario(object):
+    """
+    Everything one simulated battle depends on
+    """
+
+    def __init__(self, level=1, weapon='Rapier', armor=(), potions=2,
+                 spells=(), area=c.OVERWORLD, enemies=None, boss=False,
+                 heal_below=.3, items=None):
+        items = items or load_items()
+        for name in (weapon,) + tuple(armor) + tuple(spells):
+            if name not in items:
+                raise ValueError('{0} is not sold in any shop'.format(name))
+
+        self.level = level
+        self.health, self.magic = player_stats(level)
+        self.actions = 1 if level < 3 else 2
+        self.weapon_power = items[weapon]['power']
+        self.armor_power = sum(items[name]['power'] for name in armor)
+        self.potions = potions
+        self.spells = dict((name, items[name]) for name in spells)
+        self.heal_below = heal_below
+
+        self.boss = boss
+        self.enemy_level = make_enemy_level_dict()[area]
+        # None: one or two, like Battle.make_enemies
+        self.enemies = 1 if boss else enemies
+        self.enemy_health = WIZARD_HEALTH if boss else self.enemy_level * 4
+        self.enemy_hit = max(1, self.enemy_level * 5 - self.armor_power)
+
+
+def simulate(battle, count, rolls):
+    """
+    Fight 'count' battles of Scenario 'battle', drawing the dice in bulk from
+    the random stream 'rolls'.  Return a dict of arrays, one entry per
+    battle: 'won', 'turns', 'potions', 'health' (left), 'experience' and
+    'gold'.
+    """
+    if np is None:
+        raise ImportError('the balance simulator needs numpy')
+
+    everyone = np.arange(count)
+
+    # enemy health, a column per enemy; the dead ones have none
+    if battle.enemies is None:
+        enemy_count = rolls.randints(1, 2, count)
+    else:
+        enemy_count = np.full(count, battle.enemies)
+    enemy_health = np.where(np.arange(MAX_ENEMIES) < enemy_count[:, None],
+                            battle.enemy_health, 0)
+
+    health = np.full(count, battle.health)
+    magic = np.full(count, battle.magic)
+    potions = np.full(count, battle.potions)
+    potions_used = np.zeros(count, dtype=int)
+    turns = np.zeros(count, dtype=int)
+    fighting = np.ones(count, dtype=bool)
+
+    cure = battle.spells.get('Cure')
+    fire = battle.spells.get('Fire Blast')
+
+    for _ in range(MAX_TURNS):
+        if not fighting.any():
+            break
+        turns += fighting
+
+        for _ in range(battle.actions):
+            alive = enemy_health > 0
+            acting = fighting & alive.any(axis=1)
+            low = acting & (health < battle.heal_below * battle.health)
+
+            drink = low & (potions > 0)
+            health[drink] = np.minimum(health[drink] + HEALING_POTION,
+                                       battle.health)
+            potions -= drink
+            potions_used += drink
+
+            cast_cure = np.zeros(count, dtype=bool)
+            if cure is not None:
+                cast_cure = low & ~drink & (magic >= cure['magic points'])
+                health[cast_cure] = np.minimum(
+                    health[cast_cure] + cure['power'], battle.health)
+                magic -= cast_cure * cure['magic points']
+
+            attacking = acting & ~drink & ~cast_cure
+
+            if fire is not None:
+                blast = (attacking & (alive.sum(axis=1) >= 2) &
+                         (magic >= fire['magic points']))
+                damage = rolls.randints(fire['power'] // 2, fire['power'],
+                                        (count, MAX_ENEMIES))
+                enemy_health -= damage * (blast[:, None] & alive)
+                magic -= blast * fire['magic points']
+                attacking &= ~blast
+
+            # the first enemy standing
+            target = alive.argmax(axis=1)
+            damage = rolls.randints(battle.weapon_power - 7,
+                                    battle.weapon_power, count)
+            enemy_health[everyone, target] -= damage * attacking
+
+        alive = enemy_health > 0
+        fighting &= alive.any(axis=1)
+
+        for enemy in range(MAX_ENEMIES):
+            hitting = fighting & alive[:, enemy]
+            damage = rolls.randints(0, battle.enemy_hit, count)
+            health -= damage * hitting
+            fighting &= health > 0
+
+    won = (enemy_health <= 0).all(axis=1) & (health > 0)
+
+    # Battle.get_experience_points and get_new_gold
+    slain = np.arange(MAX_ENEMIES) < enemy_count[:, None]
+    experience = (rolls.randints(5, 10, (count, MAX_ENEMIES)) *
+                  slain).sum(axis=1)
+    gold = (rolls.randints(1, battle.enemy_level * 20, (count, MAX_ENEMIES)) *
+            slain).sum(axis=1)
+
+    return {'won': won,
+            'turns': turns,
+            'potions': potions_used,
+            'health': np.maximum(health, 0),
+            'experience': experience * won,
+            'gold': gold * won}
+
+
+def run(battle, count, seed=None):
+    """
+    Simulate 'count' battles, CHUNK_SIZE at a time, and return the
+    results of all of them together, like 'simulate'
+    """
+    rolls = session.Session(seed).rng('battle')
+    chunks = []
+    for start in range(0, count, CHUNK_SIZE):
+        chunks.append(simulate(battle, min(CHUNK_SIZE, count - start), rolls))
+    return dict((key, np.concatenate([chunk[key] for chunk in chunks]))
+                for key in chunks[0])
+
+
+def summary(results):
+    """
+    Return a dict of the figures of the results of 'run'
+    """
+    won = results['won']
+    wins = max(1, won.sum())
+    turns = results['turns'][won]
+    if not len(turns):
+        turns = np.zeros(1, dtype=int)
+
+    def mean(values):
+        return float(values.mean()) if len(values) else 0.0
+
+    return {'battles': len(won),
+            'win rate': float(won.mean()),
+            'turns mean': float(turns.mean()),
+            'turns p50': float(np.percentile(turns, 50)),
+            'turns p90': float(np.percentile(turns, 90)),
+            'turns max': int(turns.max()),
+            'potions': mean(results['potions']),
+            'potions won': mean(results['potions'][won]),
+            'potions lost': mean(results['potions'][~won]),
+            'health left': mean(results['health'][won]),
+            'experience per win': float(results['experience'].sum() / wins),
+            'gold per win': float(results['gold'].sum() / wins)}
+
+
+def report(results):
+    """
+    Return the lines of a summary of the results of 'run'
+    """
+    lines = [
+        'battles            {battles}',
+        'win rate           {win rate:.2%}',
+        'turns to kill      mean {turns mean:.2f}, p50 {turns p50:.0f}, '
+        'p90 {turns p90:.0f}, max {turns max}',
+        'potions per battle {potions:.3f} (won {potions won:.3f}, '
+        'lost {potions lost:.3f})',
+        'health left (won)  {health left:.1f}',
+        'experience per win {experience per win:.2f}',
+        'gold per win       {gold per win:.2f}']
+    figures = summary(results)
+    return [line.format(**figures) for line in lines]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Simulate battles to check the balance of the game')
+    parser.add_argument('--battles', type=int, default=1000000)
+    parser.add_argument('--level', type=int, default=1)
+    parser.add_argument('--weapon', default='Rapier')
+    parser.add_argument('--armor', nargs='*', default=[])
+    parser.add_argument('--potions', type=int, default=2)
+    parser.add_argument('--spells', nargs='*', default=[])
+    parser.add_argument('--area', default=c.OVERWORLD,
+                        choices=sorted(make_enemy_level_dict()))
+    parser.add_argument('--enemies', type=int, choices=[1, 2, 3],
+                        help='enemies per battle (default: one or two)')
+    parser.add_argument('--boss', action='store_true',
+                        help='fight the evil wizard')
+    parser.add_argument('--heal-below', type=float, default=.3,
+                        help='heal under this fraction of full health')
+    parser.add_argument('--seed', type=int)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    args = parse_args()
+    battle = Scenario(args.level, args.weapon, args.armor, args.potions,
+                      args.spells, args.area, args.enemies, args.boss,
+                      args.heal_below)
+
+    start = time.perf_counter()
+    results = run(battle, args.battles, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for line in report(results):
+        print(line)
+    print('{0} battles in {1:.2f} s'.format(args.battles, elapsed))
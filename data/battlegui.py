@@ -126,17 +126,21 @@ class InfoBox(object):
         surface.blit(image, (0, 0))
 
         if self.state == c.SELECT_ITEM:
-            text_sprites = self.make_text_sprites(self.make_item_text())
+            text = self.make_item_text()
+            text_sprites = self.make_text_sprites(text)
             text_sprites.draw(surface)
         elif self.state == c.SELECT_MAGIC:
-            text_sprites = self.make_text_sprites(self.make_magic_text())
+            text = self.make_magic_text()
+            text_sprites = self.make_text_sprites(text)
             text_sprites.draw(surface)
         else:
-            text_surface = self.font.render(
-                self.state_dict[self.state], True, c.NEAR_BLACK)
+            text = self.state_dict[self.state]
+            text_surface = self.font.render(text, True, c.NEAR_BLACK)
             text_rect = text_surface.get_rect(x=50, y=50)
             surface.blit(text_surface, text_rect)
 
+        # what the image shows, for the dirty rects
+        self.content = (self.state, text)
         return surface
 
     def set_enemy_damage(self, enemy_damage):
@@ -242,6 +246,8 @@ class SelectArrow(object):
         self.info_box = info_box
         self.image = setup.gfx()['smallarrow']
         self.rect = self.image.get_rect()
+        self.invisible_image = pg.Surface(self.rect.size)
+        self.invisible_image.set_colorkey(c.BLACK)
         self.state = 'select action'
         self.state_dict = self.make_state_dict()
         self.pos_list = make_select_action_pos_list()
@@ -370,8 +376,7 @@ class SelectArrow(object):
         """
         Make image attribute an invisible surface.
         """
-        self.image = pg.Surface(self.rect.size)
-        self.image.set_colorkey(c.BLACK)
+        self.image = self.invisible_image
 
     def become_select_item_state(self):
         self.index = 0
@@ -485,5 +490,8 @@ class PlayerHealth(object):
         """
         Draw health to surface.
         """
-        surface = setup.screen()
-        surface.blit(self.image, self.rect)
+        content = (self.health_stats['current'],
+                   self.health_stats['maximum'],
+                   self.magic_stats['current'], self.magic_stats['maximum'])
+        setup.dirty_rects().blit('health box', self.image, self.rect,
+                                 content)
@@ -1,5 +1,6 @@
 import pygame as pg
 from . import setup
+from . import constants as c
 
 class CollisionHandler(object):
     """Handles collisions between the user, blockers and computer
@@ -7,18 +8,21 @@ class CollisionHandler(object):
     #def __init__(self, player, blockers, sprites, portals, level):
     def __init__(self, level):
         self.player = level.player
-        self.static_blockers = level.blockers
-        self.blockers = make_blocker_list(level.blockers, level.sprites)
-        self.sprites = level.sprites
+        self.static_blockers = SpatialHash(level.blockers)
+        # the crowd's sprites are moved by the crowd, sleeping sprites by
+        # catch_up
+        self.sprites = level.awake_sprites
+        self.reservations = level.reservations
         self.portals = level.portals
         self.level = level
 
+        # the wander boxes don't move; sprite: SpatialHash
+        self.wander_boxes = {}
+
     def update(self):
         """
         Check for collisions between game objects.
         """
-        self.blockers = make_blocker_list(self.static_blockers,
-                                          self.sprites)
         self.player.rect.move_ip(self.player.x_vel, self.player.y_vel)
         self.check_for_blockers()
 
@@ -52,35 +56,88 @@ class CollisionHandler(object):
         """
         Checks for collisions with blocker rects.
         """
-        player_collided = False
-        sprite_collided_list = []
-
-        for blocker in self.blockers:
-            if self.player.rect.colliderect(blocker):
-                player_collided = True
+        player_collided = (
+            self.static_blockers.collides(self.player.rect) or
+            self.reservations.taken(self.player.rect))
 
         if player_collided:
             reset_after_collision(self.player)
             self.player.begin_resting()
 
+        sprite_collided_list = []
+
+        # sprites only walk into tiles they reserved, so they can't run
+        # into each other; a wanderer is reset once for every other thing
+        # it runs into, a sprite on a path goes back to the tile it came
+        # from once, whatever it ran into
         for sprite in self.sprites:
-            for blocker in self.static_blockers:
-                if sprite.rect.colliderect(blocker):
-                    sprite_collided_list.append(sprite)
+            hits = len(self.static_blockers.colliding(sprite.rect))
             if sprite.rect.colliderect(self.player.rect):
-                sprite_collided_list.append(sprite)
-            sprite.kill()
-            if pg.sprite.spritecollideany(sprite, self.sprites):
-                sprite_collided_list.append(sprite)
-            self.sprites.add(sprite)
-            for blocker in sprite.wander_box:
-                if sprite.rect.colliderect(blocker):
-                    sprite_collided_list.append(sprite)
+                hits += 1
+            if sprite.state == 'walking to':
+                if hits:
+                    sprite.step_back()
+                continue
+            hits += len(self.get_wander_box(sprite).colliding(sprite.rect))
+            sprite_collided_list.extend([sprite] * hits)
 
         for sprite in sprite_collided_list:
             reset_after_collision(sprite)
             sprite.begin_auto_resting()
 
+    def catch_up(self, sprite, frames):
+        """
+        Advance a sleeping sprite by 'frames' frames at once, without
+        animating it or checking it pixel by pixel.  A wandering sprite
+        rests until its move timer is done, as of the frame it has got to,
+        walks a tile, rests again and so on.  One that starts walking
+        towards a blocked tile, out of its wander box or under the player
+        stops right away, as it would after its first step; otherwise its
+        tile is reserved and nothing is in the way.
+        """
+        timer = sprite.move_timer
+        while frames > 0 and sprite.state in ('autoresting', 'automoving'):
+            if sprite.state == 'autoresting':
+                # rest until the move timer is done as of the frame it has
+                # got to, 'frames' frames before now
+                while frames > 0 and not timer.done(
+                        timer.milliseconds + frames * 1000.0 / c.FPS):
+                    frames -= 1
+                if not frames:
+                    break
+                sprite.auto_resting()
+                timer.start_time -= frames * 1000.0 / c.FPS
+                tile = sprite.rect.move(sprite.x_vel * 32, sprite.y_vel * 32)
+                if sprite.state == 'automoving' and (
+                        self.static_blockers.collides(tile) or
+                        self.get_wander_box(sprite).collides(tile) or
+                        tile.colliderect(self.player.rect)):
+                    sprite.begin_auto_resting()
+                continue
+
+            steps = min(frames_to_next_tile(sprite), frames)
+            sprite.rect.move_ip(sprite.x_vel * steps, sprite.y_vel * steps)
+            frames -= steps
+            if sprite.rect.x % 32 == 0 and sprite.rect.y % 32 == 0:
+                sprite.begin_auto_resting()
+
+        # a sprite following a path goes on from tile to tile
+        while frames > 0 and sprite.state == 'walking to':
+            if sprite.rect.x % 32 == 0 and sprite.rect.y % 32 == 0:
+                sprite.take_path_step()
+                if not sprite.x_vel and not sprite.y_vel:
+                    break
+            steps = min(frames_to_next_tile(sprite), frames)
+            sprite.rect.move_ip(sprite.x_vel * steps, sprite.y_vel * steps)
+            frames -= steps
+
+    def get_wander_box(self, sprite):
+        wander_box = self.wander_boxes.get(sprite)
+        if wander_box is None:
+            wander_box = SpatialHash(sprite.wander_box)
+            self.wander_boxes[sprite] = wander_box
+        return wander_box
+
     def check_for_battle(self):
         """
         Switch scene to battle 1/5 times if battles are allowed.
@@ -91,23 +148,128 @@ class CollisionHandler(object):
             if game_data['battle counter'] <= 0:
                 self.level.switch_to_battle = True
 
-def make_blocker_list(blockers, sprites):
+class SpatialHash(object):
+    """
+    Rects bucketed by the tiles they overlap, so a rect is only tested
+    against the few rects sharing a tile with it instead of all of them.
+    Each rect can carry an item (by default the rect itself) that is
+    returned when it collides.
     """
-    Return a combined list of sprite blockers and object blockers.
 
-    Was method of CollisionHandler; uses no 'self'
+    def __init__(self, rects=(), cell_size=32):
+        self.cell_size = cell_size
+        # (column, row): [(rect, item), ...]
+        self.cells = {}
+        for rect in rects:
+            self.add(rect)
+
+    def cells_of(self, rect):
+        """
+        (column, row) of every cell 'rect' overlaps
+        """
+        return tiles_of(rect, self.cell_size)
+
+    def add(self, rect, item=None):
+        if item is None:
+            item = rect
+        for cell in self.cells_of(rect):
+            self.cells.setdefault(cell, []).append((rect, item))
+
+    def colliding(self, rect):
+        """
+        Items of all the rects colliding with 'rect', each one once
+        """
+        found = []
+        seen = set()
+        for cell in self.cells_of(rect):
+            for other, item in self.cells.get(cell, ()):
+                if id(other) not in seen and rect.colliderect(other):
+                    seen.add(id(other))
+                    found.append(item)
+        return found
+
+    def collides(self, rect):
+        for cell in self.cells_of(rect):
+            for other, _ in self.cells.get(cell, ()):
+                if rect.colliderect(other):
+                    return True
+        return False
 
+class TileReservations(object):
+    """
+    The tiles held by each sprite: the one it stands on and, while it walks,
+    the one it walks to.  A sprite reserves the next tile before it starts
+    moving and gives up the previous one when it arrives, so two sprites
+    never walk into the same tile and the player is kept out of both.
     """
 
-    blocker_list = []
+    def __init__(self, sprites=(), tile_size=32):
+        self.tile_size = tile_size
+        # tile: sprite
+        self.holders = {}
+        # sprite: set of tiles
+        self.tiles = {}
+        for sprite in sprites:
+            self.add(sprite)
 
-    for blocker in blockers:
-        blocker_list.append(blocker)
+    def add(self, sprite):
+        """
+        Hold the tiles under 'sprite', and let it reserve more
+        """
+        self.tiles.setdefault(sprite, set())
+        self.settle(sprite)
+        sprite.reservations = self
 
-    for sprite in sprites:
-        blocker_list.extend(sprite.blockers)
+    def reserve(self, sprite, tile):
+        """
+        Hold 'tile' for 'sprite' and return True, or return False if
+        another sprite holds it
+        """
+        holder = self.holders.get(tile)
+        if holder is not None and holder is not sprite:
+            return False
+        self.holders[tile] = sprite
+        self.tiles[sprite].add(tile)
+        return True
 
-    return blocker_list
+    def settle(self, sprite):
+        """
+        Release the tiles 'sprite' isn't on anymore
+        """
+        under = set(tiles_of(sprite.rect, self.tile_size))
+        held = self.tiles[sprite]
+        for tile in held - under:
+            del self.holders[tile]
+            held.discard(tile)
+        for tile in under - held:
+            if self.holders.setdefault(tile, sprite) is sprite:
+                held.add(tile)
+
+    def taken(self, rect):
+        """
+        Whether any tile under 'rect' is held by a sprite
+        """
+        for tile in tiles_of(rect, self.tile_size):
+            if tile in self.holders:
+                return True
+        return False
+
+def frames_to_next_tile(sprite):
+    """
+    Frames a sprite walking one pixel a frame needs to reach a tile
+    """
+    velocity = sprite.x_vel or sprite.y_vel
+    position = sprite.rect.x if sprite.x_vel else sprite.rect.y
+    return (-position * velocity) % 32 or 32
+
+def tiles_of(rect, size=32):
+    """
+    (column, row) of every 'size' square tile 'rect' overlaps
+    """
+    return [(column, row)
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1)
+            for column in range(rect.left // size,
+                                (rect.right - 1) // size + 1)]
 
 def reset_after_collision(sprite):
     """
@@ -51,8 +51,7 @@ class Sword(object):
         Draw sprite to surface.
         """
         if self.player.state == 'attack':
-            surface = setup.screen()
-            surface.blit(self.image, self.rect)
+            setup.dirty_rects().blit('sword', self.image, self.rect)
 
 class HealthPoints(pg.sprite.Sprite):
     """
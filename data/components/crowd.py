@@ -0,0 +1,203 @@
+"""
+
+Wandering NPCs simulated together
+
+A level with many villagers wandering about spends most of its frame time
+calling Person.update and the collision checks once per sprite.  A Crowd
+keeps the positions, velocities, states and timer deadlines of all the
+wandering (autoresting / automoving) sprites of a level in numpy arrays and
+steps them at once.  The Person objects stay in the level's sprite group for
+drawing and dialogue, but they hold no simulation state anymore: the crowd
+writes their rect, state, direction and image back whenever they change.
+
+A wandering sprite rests for MOVE_TIME, picks a random direction and walks
+one tile that way, like Person.auto_resting does; it only starts walking
+when the next tile is free (reserved with the level's TileReservations),
+inside its wander box, not blocked, and clear of the player, so it never
+has to be pushed back once it is on its way.
+
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .. import setup, tools
+from .. import constants as c
+
+
+DIRECTIONS = ['up', 'down', 'left', 'right']
+VECTORS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+WANDERING = ('autoresting', 'automoving')
+
+# milliseconds between the steps of Person.auto_resting and Person.animation
+MOVE_TIME = 2000
+ANIMATION_TIME = 100
+
+# how far (in tiles, either way) from where it started a sprite may wander;
+# the wander box of a Person is the ring of tiles just past it
+WANDER_RANGE = 2
+
+
+def make_crowd(sprites, level):
+    """
+    Return a Crowd of the wandering sprites of a level, or None if numpy
+    is missing or there are too few of them to be worth it
+    """
+    wanderers = [sprite for sprite in sprites if sprite.state in WANDERING]
+
+    if np is None or not wanderers or len(wanderers) < c.CROWD_SIZE:
+        return None
+    return Crowd(wanderers, level)
+
+
+class Crowd(object):
+    """
+    Arrays of the wandering sprites of a level, stepped together once per
+    frame by 'update'
+    """
+
+    def __init__(self, sprites, level):
+        self.sprites = list(sprites)
+        # sprite: its index in the arrays
+        self.members = dict((sprite, i)
+                            for i, sprite in enumerate(self.sprites))
+        self.level = level
+        self.reservations = level.reservations
+        self.blocked = set((blocker.x // 32, blocker.y // 32)
+                           for blocker in level.blockers)
+        self.random = setup.session().rng('wandering')
+
+        now = tools.get_ticks()
+        count = len(self.sprites)
+
+        self.x = np.array([sprite.rect.x for sprite in self.sprites])
+        self.y = np.array([sprite.rect.y for sprite in self.sprites])
+        self.x_vel = np.zeros(count, dtype=int)
+        self.y_vel = np.zeros(count, dtype=int)
+        self.moving = np.zeros(count, dtype=bool)
+        self.direction = np.array([DIRECTIONS.index(sprite.direction)
+                                   for sprite in self.sprites])
+        self.index = np.array([sprite.index for sprite in self.sprites])
+
+        # tile each sprite wanders around
+        self.home_x = np.array([int(sprite.location[0])
+                                for sprite in self.sprites])
+        self.home_y = np.array([int(sprite.location[1])
+                                for sprite in self.sprites])
+
+        # timer start times, like Timer.start_time
+        self.move_start = np.full(count, now, dtype=np.int64)
+        self.animation_start = np.full(count, now, dtype=np.int64)
+
+        # sprites whose Person object is behind, while they are out of view
+        self.stale = np.zeros(count, dtype=bool)
+
+        for sprite in self.sprites:
+            sprite.state = 'autoresting'
+            sprite.x_vel = sprite.y_vel = 0
+
+    def __contains__(self, sprite):
+        return sprite in self.members
+
+    def update(self, area):
+        """
+        Step every sprite of the crowd one frame.  Only the sprites inside
+        'area' (the level's activity rect) get their Person objects
+        updated; the others are brought up to date when they come back.
+        """
+        now = tools.get_ticks()
+        was_moving = self.moving.copy()
+
+        self.start_walking(now)
+
+        # Person.animation, for the sprites that were walking
+        flip = was_moving & (now - self.animation_start > ANIMATION_TIME)
+        self.index[flip] ^= 1
+        self.animation_start[flip] = now
+
+        self.x += self.x_vel
+        self.y += self.y_vel
+
+        arrived = self.moving & (self.x % 32 == 0) & (self.y % 32 == 0)
+        self.moving[arrived] = False
+        self.x_vel[arrived] = 0
+        self.y_vel[arrived] = 0
+        self.index[arrived] = 1
+
+        inside = ((self.x + 32 > area.left) & (self.x < area.right) &
+                  (self.y + 32 > area.top) & (self.y < area.bottom))
+        changed = was_moving | self.moving | self.stale
+        # arriving sprites give up their tile by their rect, so they are
+        # always written back
+        self.write_back(np.flatnonzero(changed & inside | arrived))
+        self.stale = changed & ~inside & ~arrived
+
+        for i in np.flatnonzero(arrived):
+            self.sprites[i].begin_auto_resting()
+
+    def turn(self, sprite, direction):
+        """
+        Turn 'sprite' to face 'direction' (one of DIRECTIONS), like the
+        dialogue turns a Person towards the player
+        """
+        i = self.members[sprite]
+        self.direction[i] = DIRECTIONS.index(direction)
+        self.write_back([i])
+
+    def start_walking(self, now):
+        """
+        Pick a direction for the sprites that rested long enough and start
+        the ones that can go that way
+        """
+        ready = np.flatnonzero(~self.moving &
+                               (now - self.move_start > MOVE_TIME))
+        if not len(ready):
+            return
+
+        directions = self.random.randints(0, len(DIRECTIONS) - 1,
+                                          len(ready))
+        player_rect = self.level.player.rect
+
+        for i, direction in zip(ready, directions):
+            self.move_start[i] = now
+            sprite = self.sprites[i]
+            step_x, step_y = VECTORS[direction]
+            tile = (int(self.x[i]) // 32 + step_x,
+                    int(self.y[i]) // 32 + step_y)
+
+            if not self.reservations.reserve(sprite, tile):
+                continue
+
+            # a Person would turn, take one step into the way and stop
+            self.direction[i] = direction
+            if (tile in self.blocked or
+                    abs(tile[0] - self.home_x[i]) > WANDER_RANGE or
+                    abs(tile[1] - self.home_y[i]) > WANDER_RANGE or
+                    player_rect.colliderect(tile[0] * 32, tile[1] * 32,
+                                            32, 32)):
+                self.reservations.settle(sprite)
+                self.write_back([i])
+                continue
+
+            self.moving[i] = True
+            self.x_vel[i] = step_x
+            self.y_vel[i] = step_y
+
+    def write_back(self, indices):
+        """
+        Copy the state of the sprites at 'indices' to their Person objects
+        """
+        for i in indices:
+            sprite = self.sprites[i]
+            sprite.rect.x = int(self.x[i])
+            sprite.rect.y = int(self.y[i])
+            sprite.direction = DIRECTIONS[self.direction[i]]
+            sprite.index = int(self.index[i])
+            sprite.image = sprite.animation_dict[sprite.direction][
+                sprite.index]
+            sprite.state = 'automoving' if self.moving[i] else 'autoresting'
+            # like Person.update: no tile while it is between two
+            sprite.location = sprite.get_tile_location()
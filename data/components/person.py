@@ -1,6 +1,6 @@
 from __future__ import division
 #from itertools import izip
-import math, random, copy
+import copy
 import pygame as pg
 from .. import setup, observer
 from .. import constants as c
@@ -37,7 +37,14 @@ class Person(pg.sprite.Sprite):
         self.x_vel = 0
         self.y_vel = 0
         self.state = state
-        self.blockers = self.set_blockers()
+        # the level's collision.TileReservations, once it has one
+        self.reservations = None
+        # the level's pathfinding.Pathfinder, and the tiles left to walk
+        self.pathfinder = None
+        self.path = None
+        # the tiles a path step under way comes from and goes to
+        self.step_from = None
+        self.step_to = None
         self.location = self.get_tile_location()
         self.dialogue = ['Location: ' + str(self.location)]
         self.default_direction = 'down'
@@ -111,6 +118,7 @@ class Person(pg.sprite.Sprite):
                       'animated resting': self.animated_resting,
                       'autoresting': self.auto_resting,
                       'automoving': self.auto_moving,
+                      'walking to': self.walking_to,
                       'battle resting': self.battle_resting,
                       'attack': self.attack,
                       'enemy attack': self.enemy_attack,
@@ -136,40 +144,11 @@ class Person(pg.sprite.Sprite):
         Update sprite.
 
         """
-        self.blockers = self.set_blockers()
         self.image_list = self.animation_dict[self.direction]
         state_function = self.state_dict[self.state]
         state_function()
         self.location = self.get_tile_location()
 
-    def set_blockers(self):
-        """
-        Sets blockers to prevent collision with other sprites.
-        """
-        blockers = []
-
-        if self.state == 'resting' or self.state == 'autoresting':
-            blockers.append(pg.Rect(self.rect.x, self.rect.y, 32, 32))
-
-        elif self.state == 'moving' or self.state == 'automoving':
-            if self.rect.x % 32 == 0:
-                tile_float = self.rect.y / float(32)
-                tile1 = (self.rect.x, math.ceil(tile_float)*32)
-                tile2 = (self.rect.x, math.floor(tile_float)*32)
-                tile_rect1 = pg.Rect(tile1[0], tile1[1], 32, 32)
-                tile_rect2 = pg.Rect(tile2[0], tile2[1], 32, 32)
-                blockers.extend([tile_rect1, tile_rect2])
-
-            elif self.rect.y % 32 == 0:
-                tile_float = self.rect.x / float(32)
-                tile1 = (math.ceil(tile_float)*32, self.rect.y)
-                tile2 = (math.floor(tile_float)*32, self.rect.y)
-                tile_rect1 = pg.Rect(tile1[0], tile1[1], 32, 32)
-                tile_rect2 = pg.Rect(tile2[0], tile2[1], 32, 32)
-                blockers.extend([tile_rect1, tile_rect2])
-
-        return blockers
-
     def get_tile_location(self):
         """
         Convert pygame coordinates into tile coordinates.
@@ -272,8 +251,15 @@ class Person(pg.sprite.Sprite):
 
     def begin_auto_moving(self, direction):
         """
-        Transition sprite to a automatic moving state.
+        Transition sprite to a automatic moving state, unless the tile in
+        'direction' is taken by another sprite.
         """
+        if self.reservations is not None:
+            tile = (self.rect.x // 32 + self.vector_dict[direction][0],
+                    self.rect.y // 32 + self.vector_dict[direction][1])
+            if not self.reservations.reserve(self, tile):
+                return
+
         self.direction = direction
         self.image_list = self.animation_dict[direction]
         self.state = 'automoving'
@@ -282,11 +268,14 @@ class Person(pg.sprite.Sprite):
 
     def begin_auto_resting(self):
         """
-        Transition sprite to an automatic resting state.
+        Transition sprite to an automatic resting state; the tiles it
+        doesn't stand on anymore are released.
         """
         self.state = 'autoresting'
         self.index = 1
         self.x_vel = self.y_vel = 0
+        if self.reservations is not None:
+            self.reservations.settle(self)
 
 
     def auto_resting(self):
@@ -299,11 +288,113 @@ class Person(pg.sprite.Sprite):
 
         if self.move_timer.done():
             direction_list = ['up', 'down', 'left', 'right']
-            random.shuffle(direction_list)
+            setup.session().rng('wandering').shuffle(direction_list)
             direction = direction_list[0]
             self.begin_auto_moving(direction)
             self.move_timer.reset()
 
+    def walk_to(self, tile):
+        """
+        Start walking to 'tile' (column, row) along the shortest path,
+        from the end of the step under way if there is one.  Return False
+        if there is no way there, or no level to find one in.
+        """
+        if self.pathfinder is None:
+            return False
+        start = self.tile_ahead()
+        path = self.pathfinder.find(start, tile)
+        if path is None:
+            return False
+
+        self.path = list(path[1:])
+        if self.rect.x % 32 or self.rect.y % 32:
+            # the step under way is the first one of the path
+            self.step_from = (start[0] - self.x_vel, start[1] - self.y_vel)
+            self.step_to = start
+        self.state = 'walking to'
+        return True
+
+    def tile_ahead(self):
+        """
+        The tile the sprite stands on or, between two tiles, the one it is
+        walking to.
+        """
+        column = -(-self.rect.x // 32) if self.x_vel > 0 else self.rect.x // 32
+        row = -(-self.rect.y // 32) if self.y_vel > 0 else self.rect.y // 32
+        return column, row
+
+    def walking_to(self):
+        """
+        Follow the path; take the next step whenever on a tile.
+        """
+        self.animation()
+        if self.rect.x % 32 == 0 and self.rect.y % 32 == 0:
+            self.take_path_step()
+
+    def take_path_step(self):
+        """
+        Head for the next tile of the path once it could be reserved, or
+        wait where we are; stop at the end of the path.
+        """
+        self.x_vel = self.y_vel = 0
+        self.step_from = self.step_to = None
+        if self.reservations is not None:
+            self.reservations.settle(self)
+
+        if not self.path:
+            self.path = None
+            self.begin_resting()
+            return
+
+        tile = self.path[0]
+        if (self.reservations is not None and
+                not self.reservations.reserve(self, tile)):
+            # wanderers move on, other sprites have to be walked around
+            holder = self.reservations.holders.get(tile)
+            if holder.state not in ('autoresting', 'automoving'):
+                self.take_detour(tile)
+            return
+
+        self.path.pop(0)
+        self.step_from = (self.rect.x // 32, self.rect.y // 32)
+        self.step_to = tile
+        step = (tile[0] - self.step_from[0], tile[1] - self.step_from[1])
+        for direction, vector in self.vector_dict.items():
+            if vector == step:
+                self.direction = direction
+                self.image_list = self.animation_dict[direction]
+                self.x_vel, self.y_vel = vector
+
+    def take_detour(self, tile):
+        """
+        Find a way to the end of the path around 'tile' and return True;
+        keep waiting and return False if there is none, or no level to find
+        one in.
+        """
+        if self.pathfinder is None:
+            return False
+        start = (self.rect.x // 32, self.rect.y // 32)
+        path = self.pathfinder.search(start, self.path[-1], avoid=(tile,))
+        if path is None:
+            return False
+        self.path = list(path[1:])
+        return True
+
+    def step_back(self):
+        """
+        After bumping into something on the way, go back to the tile the
+        step came from, put the tile it was heading for back on the path
+        and wait to try again.
+        """
+        if self.step_from is not None:
+            self.rect.topleft = (self.step_from[0] * 32,
+                                 self.step_from[1] * 32)
+            self.path.insert(0, self.step_to)
+            self.step_from = self.step_to = None
+        self.x_vel = self.y_vel = 0
+        if self.reservations is not None:
+            self.reservations.settle(self)
+
     def battle_resting(self):
         """
         Player stays still during battle state unless he attacks.
@@ -410,7 +501,8 @@ class Person(pg.sprite.Sprite):
             armor_power += inventory[armor]['power']
         max_strength = max(1, (self.level * 5) - armor_power)
         min_strength = 0
-        return random.randint(min_strength, max_strength)
+        return setup.session().rng('battle').randint(min_strength,
+                                                     max_strength)
 
     def run_away(self):
         """
@@ -508,7 +600,6 @@ class Player(Person):
         """Updates player behavior"""
         self.damage_animation()
         self.healing_animation()
-        self.blockers = self.set_blockers()
 
         setup.update_keys()
 
@@ -594,7 +685,8 @@ class Player(Person):
         weapon_power = game_data['player inventory'][weapon]['power']
         max_strength = weapon_power
         min_strength = max_strength - 7
-        return random.randint(min_strength, max_strength)
+        return setup.session().rng('battle').randint(min_strength,
+                                                     max_strength)
 
 
 class Enemy(Person):
@@ -646,7 +738,6 @@ class Chest(Person):
 
     def update(self):
         """Implemented by inheriting classes"""
-        self.blockers = self.set_blockers()
         state_function = self.state_dict[self.state]
         state_function()
         self.location = self.get_tile_location()
@@ -26,6 +26,7 @@ class DialogueBox(object):
         self.image = self.make_dialogue_box_image()
         self.arrow = NextArrow()
         self.check_to_draw_arrow()
+        self.drawn_index = self.index
         self.done = False
         self.allow_input = False
         self.name = image_key
@@ -55,9 +56,11 @@ class DialogueBox(object):
         self.terminate_check()
 
     def draw_box(self):
-        """Reveal dialogue on textbox"""
-        self.image = self.make_dialogue_box_image()
-        self.check_to_draw_arrow()
+        """Reveal dialogue on textbox, when it moved on to another line"""
+        if self.index != self.drawn_index:
+            self.image = self.make_dialogue_box_image()
+            self.check_to_draw_arrow()
+            self.drawn_index = self.index
 
     def terminate_check(self):
         """Remove textbox from sprite group after 2 seconds"""
@@ -191,24 +194,31 @@ class TextHandler(object):
         if player.direction == 'up':
             if sprite.location == [tile_x, tile_y - 1]:
                 self.textbox = DialogueBox(sprite.dialogue)
-                sprite.direction = 'down'
+                self.turn_to_player(sprite, 'down')
                 self.talking_sprite = sprite
         elif player.direction == 'down':
             if sprite.location == [tile_x, tile_y + 1]:
                 self.textbox = DialogueBox(sprite.dialogue)
-                sprite.direction = 'up'
+                self.turn_to_player(sprite, 'up')
                 self.talking_sprite = sprite
         elif player.direction == 'left':
             if sprite.location == [tile_x - 1, tile_y]:
                 self.textbox = DialogueBox(sprite.dialogue)
-                sprite.direction = 'right'
+                self.turn_to_player(sprite, 'right')
                 self.talking_sprite = sprite
         elif player.direction == 'right':
             if sprite.location == [tile_x + 1, tile_y]:
                 self.textbox = DialogueBox(sprite.dialogue)
-                sprite.direction = 'left'
+                self.turn_to_player(sprite, 'left')
                 self.talking_sprite = sprite
 
+    def turn_to_player(self, sprite, direction):
+        """Turn the sprite talked to towards the player"""
+        sprite.direction = direction
+        crowd = self.level.crowd
+        if crowd is not None and sprite in crowd:
+            crowd.turn(sprite, direction)
+
     def check_for_item(self):
         """Checks if sprite has an item to give to the player"""
         item = self.talking_sprite.item
@@ -276,5 +286,5 @@ class TextHandler(object):
     def draw(self):
         """Draws textbox to surface"""
         if self.textbox:
-            surface = setup.screen()
-            surface.blit(self.textbox.image, self.textbox.rect)
+            setup.dirty_rects().blit('textbox',
+                                     self.textbox.image, self.textbox.rect)
@@ -8,6 +8,31 @@ Game level constants
 FPS = 60
 SCREEN_SIZE = (800, 608)
 
+# memory budget (bytes) of the cache of rendered level maps, see tilerender
+MAP_CACHE_BUDGET = 32 * 1024 * 1024
+
+# levels are drawn from square chunks of this many (2x) pixels, rendered
+# when they come into view and left to the map cache once this far out of
+# view
+MAP_CHUNK_SIZE = 256
+MAP_CHUNK_MARGIN = 256
+
+# memory budget (bytes) of the tile blits kept compiled for rendering maps,
+# the tiles they hold on to included, see tilerender
+BLIT_CACHE_BUDGET = 8 * 1024 * 1024
+
+# levels with at least this many wandering sprites step them together in a
+# components.crowd.Crowd (needs numpy)
+CROWD_SIZE = 32
+
+# sprites farther than this (pixels) out of the viewport sleep: they aren't
+# animated or drawn, and are moved along only once every NPC_SLEEP_FRAMES
+NPC_ACTIVE_MARGIN = 128
+NPC_SLEEP_FRAMES = 8
+
+# number of paths between tiles kept by pathfinding.PATH_CACHE
+PATH_CACHE_SIZE = 4096
+
 # for setup.py
 
 ORIGINAL_CAPTION = 'The Stolen Crown'
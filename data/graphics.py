@@ -0,0 +1,198 @@
+"""
+
+The images of resources/graphics, loaded when they are needed
+
+The game used to load and convert every image of the folder before the
+first frame, the 1024x1024 explosion only a Fire Blast shows included.  A
+Graphics maps the names of the images to the images like that dict did,
+but loads an image the first time it is looked up: the first frame only
+waits for the title screen.
+
+What the other states will need is decoded ahead of them by a prefetch
+thread: every State names the images it draws in its 'assets', and
+Control hands them to 'prefetch'.  The thread only decodes the files
+(pg.image.load); convert() and convert_alpha() need the display, which
+SDL wants used from the main thread alone, so a decoded image is
+converted when it is first looked up.  An image looked up while the
+thread is decoding it is decoded a second time rather than waited for.
+Only the main thread stores converted images, so every lookup of a name
+returns the same surface.
+
+With an asset pack (data/assetpack.py) the images come out of the pack,
+already converted, and no image file is decoded; the thread leaves them
+to the lookups.
+
+"""
+
+import collections
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import pygame as pg
+
+
+COLORKEY = (255, 0, 255)
+
+
+def load_image(path, colorkey=COLORKEY):
+    """
+    Load the image 'path' in the display format: with its alpha if it has
+    any, or else with 'colorkey' transparent
+    """
+    return convert_image(pg.image.load(path), colorkey)
+
+
+def convert_image(img, colorkey=COLORKEY):
+    """
+    The decoded image 'img' in the display format, as load_image makes it;
+    main thread only
+    """
+    if img.get_alpha():
+        img = img.convert_alpha()
+    else:
+        img = img.convert()
+        img.set_colorkey(colorkey)
+    return img
+
+
+class Graphics(Mapping):
+    """
+    The images of 'directory', by name, loaded on first use
+    """
+
+    def __init__(self, directory, colorkey=COLORKEY,
+                 accept=('.png', 'jpg', 'bmp'), pack=None):
+        self.colorkey = colorkey
+        self.pack = pack
+        self.paths = {}
+        for pic in os.listdir(directory):
+            name, ext = os.path.splitext(pic)
+            if ext.lower() in accept:
+                self.paths[name] = os.path.join(directory, pic)
+
+        self.images = {}
+        # images the prefetch thread decoded, not converted yet
+        self.decoded = {}
+        # seconds each image took to load, and on which thread
+        self.load_times = {}
+
+        self.condition = threading.Condition()
+        self.queue = collections.deque()
+        self.loading = None
+        self.thread = None
+
+    def __getitem__(self, name):
+        image = self.images.get(name)
+        if image is None:
+            image = self.load(name, 'lookup')
+        return image
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def load(self, name, by):
+        """
+        The image 'name' converted, from what the prefetch thread decoded
+        if it got to it; main thread only
+        """
+        start = time.perf_counter()
+        with self.condition:
+            decoded = self.decoded.pop(name, None)
+            seconds = self.load_times.get(name, (0, by))[0]
+        image = None
+        if decoded is None and self.pack is not None:
+            image = self.pack.image(name)
+        if image is None:
+            if decoded is None:
+                decoded = pg.image.load(self.paths[name])
+                seconds = 0
+            else:
+                by = 'prefetch'
+            image = convert_image(decoded, self.colorkey)
+        with self.condition:
+            self.images[name] = image
+            # decoded meanwhile by the thread, too late
+            self.decoded.pop(name, None)
+            self.load_times[name] = (
+                seconds + time.perf_counter() - start, by)
+        return image
+
+    def decode(self, name):
+        """
+        Decode the image 'name' for a later lookup to convert; safe off
+        the main thread
+        """
+        start = time.perf_counter()
+        decoded = pg.image.load(self.paths[name])
+        with self.condition:
+            if name not in self.images and name not in self.decoded:
+                self.decoded[name] = decoded
+                self.load_times[name] = (time.perf_counter() - start,
+                                         'prefetch')
+
+    def packed(self, name):
+        return self.pack is not None and name in self.pack.images
+
+    def loaded(self):
+        """
+        The names of the images loaded so far
+        """
+        return set(self.images)
+
+    def prefetch(self, names, first=False):
+        """
+        Have the images 'names' decoded in the background, after those
+        asked for before, or before them with 'first'; returns at once
+        """
+        names = [name for name in names
+                 if name in self.paths and name not in self.images and
+                 name not in self.decoded and not self.packed(name)]
+        if not names:
+            return
+        with self.condition:
+            if first:
+                self.queue.extendleft(reversed(names))
+            else:
+                self.queue.extend(names)
+            self.condition.notify_all()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='graphics prefetch')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def wait(self):
+        """
+        Wait until everything asked for is decoded
+        """
+        with self.condition:
+            while self.queue or self.loading:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                name = self.queue.popleft()
+                if name in self.images or name in self.decoded:
+                    self.condition.notify_all()
+                    continue
+                self.loading = name
+
+            try:
+                self.decode(name)
+            except pg.error as error:
+                print('Cannot load the image {0}: {1}'.format(name, error))
+            finally:
+                with self.condition:
+                    self.loading = None
+                    self.condition.notify_all()
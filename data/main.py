@@ -4,42 +4,61 @@ Entry point
 
 """
 
+from functools import partial
+
 from data.states import (shop, levels, battle,
                          main_menu, death, sc_credits)
 from . import tools
 from . import constants as c
 
-def main():
+# what makes each state; a state is made when the game first goes there
+STATES = {
+    c.MAIN_MENU: main_menu.Menu,
+    c.TOWN: partial(levels.LevelState, c.TOWN),
+    c.CASTLE: partial(levels.LevelState, c.CASTLE),
+    c.HOUSE: partial(levels.LevelState, c.HOUSE),
+    c.OVERWORLD: partial(levels.LevelState, c.OVERWORLD, True),
+    c.BROTHER_HOUSE: partial(levels.LevelState, c.BROTHER_HOUSE),
+    c.INN: shop.Inn,
+    c.ARMOR_SHOP: shop.ArmorShop,
+    c.WEAPON_SHOP: shop.WeaponShop,
+    c.MAGIC_SHOP: shop.MagicShop,
+    c.POTION_SHOP: shop.PotionShop,
+    c.BATTLE: battle.Battle,
+    c.DUNGEON: partial(levels.LevelState, c.DUNGEON, True),
+    c.DUNGEON2: partial(levels.LevelState, c.DUNGEON2, True),
+    c.DUNGEON3: partial(levels.LevelState, c.DUNGEON3, True),
+    c.DUNGEON4: partial(levels.LevelState, c.DUNGEON4, True),
+    c.DUNGEON5: partial(levels.LevelState, c.DUNGEON5, True),
+    c.INSTRUCTIONS: main_menu.Instructions,
+    c.LOADGAME: main_menu.LoadGame,
+    c.DEATH_SCENE: death.DeathScene,
+    c.CREDITS: sc_credits.Credits}
+
+def make_control(warm_up=False, log_states=False):
     """
-    Add states to control here
+    Add states to control here (in STATES)
 
     'player menu' is missing (FIXME)
 
+    With 'warm_up' the states the current one may lead to are made ahead
+    of time; with 'log_states' the time it takes to make each state is
+    printed.
+
     """
     run_it = tools.Control()
+    run_it.warm_up = warm_up
 
-    state_dict = {
-        c.MAIN_MENU: main_menu.Menu(),
-        c.TOWN: levels.LevelState(c.TOWN),
-        c.CASTLE: levels.LevelState(c.CASTLE),
-        c.HOUSE: levels.LevelState(c.HOUSE),
-        c.OVERWORLD: levels.LevelState(c.OVERWORLD, True),
-        c.BROTHER_HOUSE: levels.LevelState(c.BROTHER_HOUSE),
-        c.INN: shop.Inn(),
-        c.ARMOR_SHOP: shop.ArmorShop(),
-        c.WEAPON_SHOP: shop.WeaponShop(),
-        c.MAGIC_SHOP: shop.MagicShop(),
-        c.POTION_SHOP: shop.PotionShop(),
-        c.BATTLE: battle.Battle(),
-        c.DUNGEON: levels.LevelState(c.DUNGEON, True),
-        c.DUNGEON2: levels.LevelState(c.DUNGEON2, True),
-        c.DUNGEON3: levels.LevelState(c.DUNGEON3, True),
-        c.DUNGEON4: levels.LevelState(c.DUNGEON4, True),
-        c.DUNGEON5: levels.LevelState(c.DUNGEON5, True),
-        c.INSTRUCTIONS: main_menu.Instructions(),
-        c.LOADGAME: main_menu.LoadGame(),
-        c.DEATH_SCENE: death.DeathScene(),
-        c.CREDITS: sc_credits.Credits()}
+    state_dict = tools.StateRegistry(STATES)
+    state_dict.log = log_states
 
     run_it.setup_states(state_dict, c.MAIN_MENU)
-    run_it.main()
+    return run_it
+
+def main(frames=None):
+    """
+    Run the game ('frames' frames, if given); return the Control
+    """
+    run_it = make_control()
+    run_it.main(frames)
+    return run_it
@@ -90,9 +90,7 @@ class SmallArrow(pg.sprite.Sprite):
         """
         Draw to surface"""
 
-        surface = setup.screen()
-
-        surface.blit(self.image, self.rect)
+        setup.dirty_rects().blit('menu arrow', self.image, self.rect)
 
 
 class QuickStats(pg.sprite.Sprite):
@@ -112,6 +110,13 @@ class QuickStats(pg.sprite.Sprite):
         """
         stat_list = ['GOLD', 'health', 'magic']
         magic_health_list = ['health', 'magic']
+        # what the box shows, for the dirty rects
+        self.content = (self.inventory['GOLD']['quantity'],
+                        self.stats['health']['current'],
+                        self.stats['health']['maximum'],
+                        self.stats['magic']['current'],
+                        self.stats['magic']['maximum'],
+                        setup.game_data()['crown quest'])
         image = setup.gfx()['goldbox']
         rect = image.get_rect(left=10, top=244)
 
@@ -152,8 +157,8 @@ class QuickStats(pg.sprite.Sprite):
         """
         Draw to surface.
         """
-        surface = setup.screen()
-        surface.blit(self.image, self.rect)
+        setup.dirty_rects().blit('gold box', self.image, self.rect,
+                                 self.content)
 
 
 class InfoBox(pg.sprite.Sprite):
@@ -181,6 +186,7 @@ class InfoBox(pg.sprite.Sprite):
 
         self.image = None
         self.rect = None
+        self.content = None
 
     def get_attack_power(self):
         """
@@ -372,12 +378,15 @@ class InfoBox(pg.sprite.Sprite):
     def update(self):
         state_function = self.state_dict[self.state]
         state_function()
+        # what the box shows, for the dirty rects
+        self.content = (self.state, repr(self.inventory),
+                        repr(self.player_stats))
 
 
     def draw(self):
         """Draw to surface"""
-        surface = setup.screen()
-        surface.blit(self.image, self.rect)
+        setup.dirty_rects().blit('info box', self.image, self.rect,
+                                 self.content)
 
 
 class SelectionBox(pg.sprite.Sprite):
@@ -403,8 +412,7 @@ class SelectionBox(pg.sprite.Sprite):
 
     def draw(self):
         """Draw to surface"""
-        surface = setup.screen()
-        surface.blit(self.image, self.rect)
+        setup.dirty_rects().blit('selection box', self.image, self.rect)
 
 
 class MenuGui(object):
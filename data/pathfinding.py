@@ -0,0 +1,110 @@
+"""
+
+Paths between the tiles of a level
+
+A Pathfinder knows which 32x32 tiles of a level can be walked on: all of
+them, except the ones under a TMX blocker or a portal (walking into a door
+would change the level).  It answers A* queries on that grid.  The blockers
+and portals of a map never change while it is played, so the grid is fixed
+per map and paths are cached in PATH_CACHE by (map, start, goal) for as
+long as the game runs.
+
+Other sprites are not part of the grid: a sprite following a path reserves
+each tile before it steps on it (see collision.TileReservations) and waits
+if somebody is in the way.
+
+"""
+
+import heapq
+import itertools
+
+from . import constants as c
+from .pytmx.utils import LRUCache
+
+
+# (map name, start, goal): tuple of tiles, or None if there is no path
+PATH_CACHE = LRUCache(c.PATH_CACHE_SIZE)
+
+NEIGHBOURS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+
+class Pathfinder(object):
+    """
+    Walkability grid of a level, 'size' in pixels, and the paths on it
+    """
+
+    def __init__(self, name, size, blockers, portals=(), tile_size=32):
+        self.tile_size = tile_size
+        self.width = size[0] // tile_size
+        self.height = size[1] // tile_size
+        self.blocked = set(self.tile_of(rect) for rect in blockers)
+        self.blocked.update(self.tile_of(sprite.rect) for sprite in portals)
+
+        # the grid as loaded from the TMX map is the same on every visit
+        self.name = name
+
+    def tile_of(self, rect):
+        return rect.x // self.tile_size, rect.y // self.tile_size
+
+    def walkable(self, tile):
+        column, row = tile
+        return (0 <= column < self.width and 0 <= row < self.height and
+                tile not in self.blocked)
+
+    def find(self, start, goal):
+        """
+        Return the shortest path from tile 'start' to tile 'goal' as a
+        tuple of tiles, both ends included, or None if there is none
+        """
+        start = tuple(start)
+        goal = tuple(goal)
+        key = (self.name, start, goal)
+
+        if key in PATH_CACHE:
+            return PATH_CACHE.get(key)
+
+        path = self.search(start, goal)
+        PATH_CACHE.put(key, path)
+        return path
+
+    def search(self, start, goal, avoid=()):
+        """
+        A* from 'start' to 'goal', with the Manhattan distance as heuristic.
+        The tiles in 'avoid' count as blocked; such detours are not cached.
+        """
+        if not self.walkable(goal) or goal in avoid:
+            return None
+
+        def distance(tile):
+            return abs(tile[0] - goal[0]) + abs(tile[1] - goal[1])
+
+        # ties are broken by insertion order, so paths are reproducible
+        order = itertools.count()
+        frontier = [(distance(start), next(order), start)]
+        came_from = {start: None}
+        cost = {start: 0}
+
+        while frontier:
+            _, _, tile = heapq.heappop(frontier)
+            if tile == goal:
+                break
+
+            for step_x, step_y in NEIGHBOURS:
+                neighbour = (tile[0] + step_x, tile[1] + step_y)
+                new_cost = cost[tile] + 1
+                if (self.walkable(neighbour) and neighbour not in avoid and
+                        new_cost < cost.get(neighbour, new_cost + 1)):
+                    cost[neighbour] = new_cost
+                    came_from[neighbour] = tile
+                    heapq.heappush(frontier, (new_cost + distance(neighbour),
+                                              next(order), neighbour))
+        else:
+            return None
+
+        path = []
+        tile = goal
+        while tile is not None:
+            path.append(tile)
+            tile = came_from[tile]
+        path.reverse()
+        return tuple(path)
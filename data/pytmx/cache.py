@@ -0,0 +1,154 @@
+"""
+
+On-disk cache of parsed TMX maps
+
+A TiledMap is pure python data once it has been parsed (the images are
+attached later by a loader), so it can be pickled as a whole: layer gid
+arrays, the gid maps, object groups with their typed properties and the
+tileset references.  Each map gets one cache file in CACHE_DIR, next to the
+TMX file, holding a small header and the pickled map.  The file is read in
+one go; the header says whether it still matches the TMX source.
+
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+
+from data.pytmx import pytmx
+
+
+__all__ = ['load_map', 'load_cached', 'store', 'cache_path']
+
+# bump whenever the layout of TiledMap (or its children) changes
+CACHE_VERSION = 3
+
+CACHE_DIR = '.tmxcache'
+
+MAGIC = b'TMXC'
+
+# magic, cache version, tmx mtime (ns), tmx size, sha1 of the tmx contents
+HEADER = struct.Struct('<4sHqQ20s')
+
+
+def cache_path(filename):
+    """
+    Return the path of the cache file for the TMX map 'filename'
+    """
+
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    return os.path.join(dirname, CACHE_DIR, basename + '.cache')
+
+
+def read_source(filename):
+    """
+    Return (mtime, size, digest) of a TMX file
+    """
+
+    stat = os.stat(filename)
+    with open(filename, 'rb') as tmx_file:
+        digest = hashlib.sha1(tmx_file.read()).digest()
+    return stat.st_mtime_ns, stat.st_size, digest
+
+
+def load_cached(filename):
+    """
+    Return the cached TiledMap for 'filename', or None if there is no cache
+    file or it doesn't match the TMX file anymore
+    """
+
+    try:
+        with open(cache_path(filename), 'rb') as cache_file:
+            blob = cache_file.read()
+    except IOError:
+        return None
+
+    if len(blob) < HEADER.size:
+        return None
+
+    magic, version, mtime, size, digest = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != CACHE_VERSION:
+        return None
+
+    # a matching mtime and size is enough; otherwise (a fresh checkout,
+    # a copied tree) fall back to comparing the contents
+    stat = os.stat(filename)
+    source = None
+    if (stat.st_mtime_ns, stat.st_size) != (mtime, size):
+        source = read_source(filename)
+        if source[2] != digest:
+            return None
+
+    try:
+        tmxdata = pickle.loads(memoryview(blob)[HEADER.size:])
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if source is not None:
+        restamp(filename, *source)
+
+    # the tileset sources are relative to the map file
+    tmxdata.filename = filename
+    return tmxdata
+
+
+def restamp(filename, mtime, size, digest):
+    """
+    Write the current mtime and size of the TMX file into the header of
+    its cache file, whose contents still match, so the next start doesn't
+    hash the file again
+    """
+
+    path = cache_path(filename)
+    try:
+        with open(path, 'r+b') as cache_file:
+            cache_file.write(
+                HEADER.pack(MAGIC, CACHE_VERSION, mtime, size, digest))
+    except (IOError, OSError) as error:
+        msg = "Cannot update TMX cache {0}: {1}"
+        print(msg.format(path, error))
+
+
+def store(tmxdata):
+    """
+    Write the cache file of a freshly parsed TiledMap
+
+    An unwritable resources directory only means the map gets parsed again
+    next time, so errors are not fatal here.
+    """
+
+    filename = tmxdata.filename
+    path = cache_path(filename)
+    temp_path = path + '.tmp'
+
+    try:
+        mtime, size, digest = read_source(filename)
+        header = HEADER.pack(MAGIC, CACHE_VERSION, mtime, size, digest)
+        payload = pickle.dumps(tmxdata, pickle.HIGHEST_PROTOCOL)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(temp_path, 'wb') as cache_file:
+            cache_file.write(header)
+            cache_file.write(payload)
+        os.replace(temp_path, path)
+    except (IOError, OSError, pickle.PicklingError) as error:
+        msg = "Cannot write TMX cache {0}: {1}"
+        print(msg.format(path, error))
+
+
+def load_map(filename, use_cache=True):
+    """
+    Return the parsed TiledMap for 'filename', from the cache if possible
+    """
+
+    if use_cache:
+        tmxdata = load_cached(filename)
+        if tmxdata is not None:
+            return tmxdata
+
+    tmxdata = pytmx.TiledMap(filename)
+    if use_cache:
+        store(tmxdata)
+    return tmxdata
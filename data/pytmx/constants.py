@@ -14,3 +14,8 @@ GID_TRANS_FLIPX = 1<<31
 GID_TRANS_FLIPY = 1<<30
 GID_TRANS_ROT = 1<<29
 
+
+# tile opacity classes, see tmxloader.analyse_opacity
+OPAQUE = 0
+BINARY_ALPHA = 1
+PARTIAL_ALPHA = 2
@@ -1,7 +1,12 @@
 from itertools import chain, product
 from xml.etree import ElementTree
 
-from .utils import decode_gid, parse_properties, TYPES
+from .utils import decode_gid, decode_gids, parse_properties, TYPES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 __all__ = [
@@ -76,6 +81,11 @@ class TiledMap(TiledElement):
         self.imagemap = {}  # mapping of gid and trans flags to real gids
         self.maxgid = 1
 
+        # object indexes, built by index_objects once the map is loaded
+        self.objects_by_name = defaultdict(list)
+        self.objects_by_type = defaultdict(list)
+        self.object_grid = defaultdict(list)  # (tile x, tile y): objects
+
         if filename:
             self.load()
 
@@ -102,6 +112,66 @@ class TiledMap(TiledElement):
 
         return chain(*(i for i in self.objectgroups))
 
+    def objects_named(self, name):
+        """
+        Return a list of the objects called 'name', in map order
+        """
+
+        return list(self.objects_by_name.get(name, ()))
+
+    def objects_of_type(self, type_name):
+        """
+        Return a list of the objects of type 'type_name', in map order
+        """
+
+        return list(self.objects_by_type.get(type_name, ()))
+
+    def objects_in_rect(self, rect):
+        """
+        Return a list of the objects overlapping 'rect', an (x, y, width,
+        height) area in map pixels, in map order
+        """
+
+        left, top, width, height = rect
+        found = {}
+        for cell in self.cells_of(left, top, width, height):
+            for obj in self.object_grid.get(cell, ()):
+                if id(obj) not in found and overlaps(
+                        object_bounds(obj, self), (left, top, width, height)):
+                    found[id(obj)] = obj
+
+        return sorted(found.values(), key=lambda obj: obj.map_order)
+
+    def cells_of(self, left, top, width, height):
+        """
+        Tile cells covered by an area in map pixels
+        """
+
+        first_x = int(left // self.tilewidth)
+        first_y = int(top // self.tileheight)
+        last_x = int((left + max(width, 1) - 1) // self.tilewidth)
+        last_y = int((top + max(height, 1) - 1) // self.tileheight)
+
+        return product(range(first_x, last_x + 1),
+                       range(first_y, last_y + 1))
+
+    def index_objects(self):
+        """
+        Build the lookups of objects by name, by type, and by the tiles
+        they cover
+        """
+
+        self.objects_by_name.clear()
+        self.objects_by_type.clear()
+        self.object_grid.clear()
+
+        for index, obj in enumerate(self.objects):
+            obj.map_order = index
+            self.objects_by_name[obj.name].append(obj)
+            self.objects_by_type[obj.type].append(obj)
+            for cell in self.cells_of(*object_bounds(obj, self)):
+                self.object_grid[cell].append(obj)
+
     def get_tile_properties_by_gid(self, gid):
         try:
             return self.tile_properties[gid]
@@ -143,6 +213,27 @@ class TiledMap(TiledElement):
         else:
             return 0
 
+    def register_gids(self, raw_gids):
+        """
+        register_gid for a numpy array of raw gids (gid and flags, as read
+        from the tmx data).  returns an array of the same shape with the
+        gids used internally.
+
+        every distinct raw gid is registered once, in order of first
+        appearance, so the internal gids are the same register_gid would
+        hand out tile by tile.
+        """
+
+        uniques, first, inverse = np.unique(
+            raw_gids, return_index=True, return_inverse=True)
+
+        gids, flags = decode_gids(uniques)
+        lookup = np.zeros(len(uniques), dtype=np.uint32)
+        for k in np.argsort(first, kind='stable'):
+            lookup[k] = self.register_gid(int(gids[k]), int(flags[k]))
+
+        return lookup[inverse].reshape(raw_gids.shape)
+
     def map_gid(self, real_gid):
         """
         used to lookup a GID read from a TMX file's data
@@ -193,6 +284,8 @@ class TiledMap(TiledElement):
             if properties:
                 obj.__dict__.update(properties)
 
+        self.index_objects()
+
     def add_tile_layer(self, layer):
         """
         Add a TiledLayer layer object to the map.
@@ -236,6 +329,35 @@ class TiledMap(TiledElement):
         return (l for l in self.all_layers if l.visible)
 
 
+def object_bounds(obj, tiledmap):
+    """
+    Return the (x, y, width, height) area of an object in map pixels.
+
+    tile objects (objects with a gid) are anchored at their bottom left
+    corner and default to the size of a tile
+    """
+
+    if obj.gid:
+        width = obj.width or tiledmap.tilewidth
+        height = obj.height or tiledmap.tileheight
+        return obj.x, obj.y - height, width, height
+
+    return obj.x, obj.y, obj.width, obj.height
+
+
+def overlaps(area, rect):
+    """
+    True if 'area' and 'rect', both (x, y, width, height), overlap; an empty
+    area counts as a point
+    """
+
+    left, top, width, height = area
+    r_left, r_top, r_width, r_height = rect
+
+    return (left < r_left + r_width and r_left < left + max(width, 1) and
+            top < r_top + r_height and r_top < top + max(height, 1))
+
+
 class TiledTileset(TiledElement):
     reserved = ("visible firstgid source name tilewidth tileheight" +
                 " spacing margin image tile properties").split()
@@ -255,6 +377,9 @@ class TiledTileset(TiledElement):
         self.width = 0
         self.height = 0
 
+        # per-tile opacity classes, filled in by a loader
+        self.opacity = None
+
         self.parse(node)
 
     def __repr__(self):
@@ -295,7 +420,7 @@ class TiledTileset(TiledElement):
 
         # since tile objects [probably] don't have a lot of metadata,
         # we store it separately in the parent (a TiledMap instance)
-        for child in node.getiterator('tile'):
+        for child in node.iter('tile'):
             real_gid = int(child.get("id"))
             properties = parse_properties(child)
             properties['width'] = self.tilewidth
@@ -349,7 +474,7 @@ class TiledLayer(TiledElement):
 
         encoding = data_node.get("encoding", None)
         if encoding == "base64":
-            from base64 import decodestring
+            from base64 import b64decode as decodestring
 
             data = decodestring(data_node.text.strip().encode())
 
@@ -366,10 +491,10 @@ class TiledLayer(TiledElement):
 
         compression = data_node.get("compression", None)
         if compression == "gzip":
-            from io import StringIO
+            from io import BytesIO
             import gzip
 
-            file_handle = gzip.GzipFile(fileobj=StringIO(data))
+            file_handle = gzip.GzipFile(fileobj=BytesIO(data))
             data = file_handle.read()
             file_handle.close()
 
@@ -391,7 +516,20 @@ class TiledLayer(TiledElement):
 
             next_gid = get_children(data_node)
 
-        elif data:
+        if np is not None:
+            # data is the little endian 32-bit gids, one per tile; view it as
+            # a 2d array (no copy) and remap the whole layer at once
+            if data:
+                raw_gids = np.frombuffer(data, dtype='<u4')
+            else:
+                raw_gids = np.fromiter(next_gid, dtype=np.uint32,
+                                       count=self.width * self.height)
+
+            self.data = self.parent.register_gids(
+                raw_gids.reshape(self.height, self.width))
+            return
+
+        if data:
             # data is a list of gids. cast as 32-bit ints to format properly
             # create iterator to efficiently parse data
             next_gid = (
@@ -10,14 +10,160 @@ import os
 import pygame
 
 from data.pytmx import pytmx
+from data.pytmx import cache
 #from .constants import *
 from .constants import TRANS_FLIPX, TRANS_FLIPY, TRANS_ROT
+from .constants import OPAQUE, BINARY_ALPHA, PARTIAL_ALPHA
+from .utils import LRUCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 #__all__ = ['load_pygame', 'load_tmx']
 __all__ = ['load_pygame']
 
 
+def surface_bytes(surface):
+    """ pixel memory held by a surface """
+    return surface.get_pitch() * surface.get_height()
+
+# converted tiles (and the tileset images they are cut from) are shared by
+# every map loaded in the process; most maps use the same tilesets.  keys are
+# (path, local tile id, flags, conversion mode) for tiles and (path,) for
+# tileset images.
+TILE_CACHE = LRUCache(8 * 1024 * 1024, surface_bytes)
+
+# baked tiles and tileset images (a data.assetpack.AssetPack), looked up on
+# a tile cache miss before anything is loaded or converted
+ASSET_PACK = None
+
+
+def use_asset_pack(pack):
+    """ take the TILE_CACHE misses from 'pack' first; None for no pack """
+
+    global ASSET_PACK
+    ASSET_PACK = pack
+
+
+def cached(key):
+    """ the surface of a tile cache key, from the cache or the asset pack;
+    a tile the pack has counts as a pack hit, not as a tile cache miss """
+
+    if ASSET_PACK is not None and key not in TILE_CACHE:
+        surface = ASSET_PACK.tile(key)
+        if surface is not None:
+            TILE_CACHE.put(key, surface)
+            return surface
+    return TILE_CACHE.get(key)
+
+
+def load_image(path):
+    """ load an image file, through the tile cache """
+
+    key = (path,)
+    image = cached(key)
+    if image is None:
+        image = pygame.image.load(path)
+        TILE_CACHE.put(key, image)
+    return image
+
+
+# opacity tables of tileset images, keyed by (path, tile geometry)
+OPACITY_TABLES = {}
+
+# colorkeys tried, in order, for tiles that only have binary alpha
+BINARY_ALPHA_COLORKEYS = ((255, 0, 255), (0, 255, 255), (1, 2, 3))
+
+
+def analyse_opacity(image, tilesize, margin=0, spacing=0):
+    """
+    classify every tile of a tileset image at once from its alpha channel
+
+    returns an array of [row, column] holding OPAQUE, BINARY_ALPHA or
+    PARTIAL_ALPHA for each tile, or None if the image has no per-pixel alpha
+    (or numpy is missing); smart_convert then tests tile by tile.
+    """
+
+    if np is None or not image.get_flags() & pygame.SRCALPHA:
+        return None
+
+    tile_w, tile_h = tilesize
+    step_x, step_y = tile_w + spacing, tile_h + spacing
+    img_w, img_h = image.get_size()
+    columns = (img_w - margin * 2 + spacing) // step_x
+    rows = (img_h - margin * 2 + spacing) // step_y
+    if columns <= 0 or rows <= 0:
+        return None
+
+    # pad to whole steps so the sheet can be viewed as a grid of tiles;
+    # padding is opaque and only ever covers spacing
+    grid = np.full((columns * step_x, rows * step_y), 255, dtype=np.uint8)
+    alpha = pygame.surfarray.pixels_alpha(image)
+    region = alpha[margin:margin + columns * step_x,
+                   margin:margin + rows * step_y]
+    grid[:region.shape[0], :region.shape[1]] = region
+    # release the lock on the image, it is blitted from later
+    del alpha, region
+
+    # "opaque" uses the threshold of pygame.mask, as the per-tile test does
+    tiles = grid.reshape(columns, step_x, rows, step_y)[:, :tile_w, :, :tile_h]
+    opaque = (tiles > 127).all(axis=(1, 3))
+    binary = ((tiles == 255) | (tiles == 0)).all(axis=(1, 3))
+
+    table = np.where(opaque, OPAQUE,
+                     np.where(binary, BINARY_ALPHA, PARTIAL_ALPHA))
+    return table.T
+
+
+def tileset_opacity(path, image, tileset):
+    """ opacity table of a tileset, analysed once per tileset image """
+
+    key = (path, tileset.tilewidth, tileset.tileheight,
+           tileset.margin, tileset.spacing)
+    try:
+        return OPACITY_TABLES[key]
+    except KeyError:
+        table = analyse_opacity(
+            image, (tileset.tilewidth, tileset.tileheight),
+            tileset.margin, tileset.spacing)
+        OPACITY_TABLES[key] = table
+        return table
+
+
+def free_colorkey(tile):
+    """ a color from BINARY_ALPHA_COLORKEYS not used by the tile, or None """
+
+    pixels = pygame.surfarray.array3d(tile)
+    visible = pygame.surfarray.array_alpha(tile) != 0
+    for color in BINARY_ALPHA_COLORKEYS:
+        if not (visible & (pixels == color).all(axis=2)).any():
+            return color
+    return None
+
+
+def tile_opacity(tileset, tiles_x, tiles_y):
+    """ opacity class of the tile at (tiles_x, tiles_y) of a tileset image """
+
+    table = tileset.opacity
+    if table is None:
+        return None
+
+    column = (tiles_x - tileset.margin) // (
+        tileset.tilewidth + tileset.spacing)
+    row = (tiles_y - tileset.margin) // (tileset.tileheight + tileset.spacing)
+    if row < table.shape[0] and column < table.shape[1]:
+        return int(table[row, column])
+    return None
+
+
+def color_key(color):
+    """ hashable form of an optional color, for cache keys """
+    return tuple(color) if color else None
+
+
 def handle_transformation(tile, flags):
     """ flip and rotate tiles """
 
@@ -45,21 +191,36 @@ def handle_transformation(tile, flags):
         return tile
 
 
-def smart_convert(original, colorkey, force_colorkey, pixelalpha):
+def smart_convert(original, colorkey, force_colorkey, pixelalpha,
+                  opacity=None):
     """
     this method does several tests on a surface to determine the optimal
     flags and pixel format for each tile surface.
 
     this is done for the best rendering speeds and removes the need to
     convert() the images on your own
+
+    'opacity' is the class of the tile from analyse_opacity, if known; tiles
+    with only fully opaque and fully transparent pixels are turned into
+    colorkey surfaces, which blit much faster than per-pixel alpha.
     """
     tile_size = original.get_size()
 
-    # count the number of pixels in the tile that are not transparent
-    num_pixels = pygame.mask.from_surface(original).count()
+    if opacity is None:
+        # count the number of pixels in the tile that are not transparent
+        num_pixels = pygame.mask.from_surface(original).count()
+        if num_pixels == tile_size[0] * tile_size[1]:
+            opacity = OPAQUE
+        else:
+            opacity = PARTIAL_ALPHA
+        binary_key = None
+    elif opacity == BINARY_ALPHA and pixelalpha:
+        binary_key = free_colorkey(original)
+    else:
+        binary_key = None
 
     # there are no transparent pixels in the image
-    if num_pixels == tile_size[0] * tile_size[1]:
+    if opacity == OPAQUE:
         tile = original.convert()
 
     # there are transparent pixels, and set to force a colorkey
@@ -74,6 +235,13 @@ def smart_convert(original, colorkey, force_colorkey, pixelalpha):
         tile = original.convert()
         tile.set_colorkey(colorkey, pygame.RLEACCEL)
 
+    # there are only fully transparent pixels, use a colorkey for them
+    elif binary_key:
+        tile = pygame.Surface(tile_size)
+        tile.fill(binary_key)
+        tile.blit(original, (0, 0))
+        tile.set_colorkey(binary_key, pygame.RLEACCEL)
+
     # there are transparent pixels, and set for perpixel alpha
     elif pixelalpha:
         tile = original.convert_alpha()
@@ -137,8 +305,9 @@ def _load_images_pygame(tmxdata, *_, **kwargs):
     tmxdata.images = [0] * tmxdata.maxgid
 
     for tileset in tmxdata.tilesets:
-        path = os.path.join(os.path.dirname(tmxdata.filename), tileset.source)
-        image = pygame.image.load(path)
+        path = os.path.normpath(os.path.join(
+            os.path.dirname(os.path.abspath(tmxdata.filename)), tileset.source))
+        image = load_image(path)
 
         img_w, img_h = image.get_size()
 
@@ -170,6 +339,10 @@ def _load_images_pygame(tmxdata, *_, **kwargs):
         if colorkey:
             colorkey = pygame.Color('#{0}'.format(colorkey))
 
+        mode = (color_key(colorkey), color_key(force_colorkey), pixelalpha)
+
+        tileset.opacity = tileset_opacity(path, image, tileset)
+
         for real_gid, (tiles_y, tiles_x) in enumerate(product,
                                                       tileset.firstgid):
             if tiles_x + tileset.tilewidth - tileset.spacing > width:
@@ -178,12 +351,21 @@ def _load_images_pygame(tmxdata, *_, **kwargs):
             gids = tmxdata.map_gid(real_gid)
 
             if gids:
+                local_id = real_gid - tileset.firstgid
                 try:
-                    original = image.subsurface(((tiles_x, tiles_y), tile_size))
+                    original = None
                     for gid, flags in gids:
-                        tile = handle_transformation(original, flags)
-                        tile = smart_convert(
-                            tile, colorkey, force_colorkey, pixelalpha)
+                        key = (path, local_id, flags, mode)
+                        tile = cached(key)
+                        if tile is None:
+                            if original is None:
+                                original = image.subsurface(
+                                    ((tiles_x, tiles_y), tile_size))
+                            tile = handle_transformation(original, flags)
+                            tile = smart_convert(
+                                tile, colorkey, force_colorkey, pixelalpha,
+                                tile_opacity(tileset, tiles_x, tiles_y))
+                            TILE_CACHE.put(key, tile)
                         tmxdata.images[gid] = tile
                 except ValueError as ve_exception:
                     pass
@@ -203,10 +385,16 @@ def _load_images_pygame(tmxdata, *_, **kwargs):
                 real_gid = len(tmxdata.images)
                 gid = tmxdata.register_gid(real_gid)
                 layer.gid = gid
-                path = os.path.join(os.path.dirname(tmxdata.filename), source)
-                image = pygame.image.load(path)
-                image = smart_convert(
-                    image, colorkey, force_colorkey, pixelalpha)
+                path = os.path.normpath(os.path.join(
+                    os.path.dirname(os.path.abspath(tmxdata.filename)),
+                    source))
+                key = (path, 0, 0, (color_key(colorkey),
+                                    color_key(force_colorkey), pixelalpha))
+                image = cached(key)
+                if image is None:
+                    image = smart_convert(
+                        load_image(path), colorkey, force_colorkey, pixelalpha)
+                    TILE_CACHE.put(key, image)
                 tmxdata.images.append(image)
 
 
@@ -216,9 +404,12 @@ def load_pygame(filename, *args, **kwargs):
 
     Load a TMX file, load the images,
     and return a TiledMap class that is ready to use.
+
+    The parsed map comes from the on-disk cache when it is up to date;
+    pass "use_cache=False" to always parse the TMX file.
     """
 
-    tmxdata = pytmx.TiledMap(filename)
+    tmxdata = cache.load_map(filename, kwargs.pop('use_cache', True))
     _load_images_pygame(tmxdata, *args, **kwargs)
     return tmxdata
 
@@ -1,4 +1,4 @@
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from .constants import (GID_TRANS_FLIPX, GID_TRANS_FLIPY,
                         TRANS_FLIPX, TRANS_FLIPY,
@@ -41,6 +41,91 @@ def decode_gid(raw_gid):
     return gid, flags
 
 
+def decode_gids(raw_gids):
+    """
+    decode_gid for a whole numpy array of raw gids at once; returns the
+    arrays of gids and of flags
+    """
+
+    flags = ((raw_gids & GID_TRANS_FLIPX != 0) * TRANS_FLIPX +
+             (raw_gids & GID_TRANS_FLIPY != 0) * TRANS_FLIPY +
+             (raw_gids & GID_TRANS_ROT != 0) * TRANS_ROT)
+
+    gids = raw_gids & (
+        ~(GID_TRANS_FLIPX | GID_TRANS_FLIPY | GID_TRANS_ROT) & 0xFFFFFFFF)
+
+    return gids, flags
+
+
+class LRUCache(object):
+    """
+    Mapping of keys to values that holds at most 'max_size' worth of values,
+    measured with 'size_of'; once full, the least recently used values are
+    dropped first.
+
+    hits, misses and evictions are counted for reporting.
+    """
+
+    def __init__(self, max_size, size_of=lambda value: 1):
+        self.max_size = max_size
+        self.size_of = size_of
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.discard(key)
+        self._items[key] = value
+        self.size += self.size_of(value)
+
+        # never evict the value just stored, even if it is over budget
+        while self.size > self.max_size and len(self._items) > 1:
+            _, old_value = self._items.popitem(last=False)
+            self.size -= self.size_of(old_value)
+            self.evictions += 1
+
+    def discard(self, key):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            return
+        self.size -= self.size_of(value)
+
+    def clear(self):
+        self._items.clear()
+        self.size = 0
+
+    def items(self):
+        """ (key, value) pairs, least recently used first """
+        return list(self._items.items())
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._items),
+                'size': self.size}
+
+
 def handle_bool(text):
     """
     Somewhat sketchy way to convert strings to bool objects by abusing the
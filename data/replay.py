@@ -0,0 +1,206 @@
+"""
+
+Recording and replaying keyboard input
+
+All the game reads of the keyboard is the state of a few keys, through
+setup.keys(), and the key events Control.event_loop hands to the states.
+A Recorder keeps the state of those keys after every frame; a Replayer
+gives them back, one frame at a time, as the key source of
+setup.update_keys() together with the KEYDOWN / KEYUP events that lead to
+them.
+
+Both run the game on a tools.VirtualClock, so the Timers see exactly the
+same game time on every run, and the game session is seeded with the seed
+stored in the file, so the dice roll the same: a replay of a session from
+the main menu does what the recorded session did, frame by frame (as long
+as the save slots are the same).
+
+A replay file is a header and the key states, run length encoded: a key
+state is a byte with one bit per key in KEYS, and most of the time it
+doesn't change from one frame to the next.
+
+"""
+
+import struct
+
+import pygame as pg
+
+from . import setup
+from . import constants as c
+
+
+# the keys the game looks at; any other key pressed sets the last bit
+KEYS = [pg.K_UP, pg.K_DOWN, pg.K_LEFT, pg.K_RIGHT,
+        pg.K_SPACE, pg.K_RETURN, pg.K_q]
+OTHER_KEY = 1 << len(KEYS)
+
+KEY_BITS = dict((key, 1 << i) for i, key in enumerate(KEYS))
+
+# bump whenever KEYS, the layout of the file or what the seed seeds changes
+REPLAY_VERSION = 2
+
+MAGIC = b'TSCR'
+
+# magic, version, frames per second, random seed, number of frames
+HEADER = struct.Struct('<4sHHQI')
+
+# number of frames, key state
+RUN = struct.Struct('<HB')
+
+
+class ReplayError(Exception):
+    pass
+
+
+def key_state(keys):
+    """
+    Return the key state byte of 'keys', as returned by setup.keys()
+    """
+    if isinstance(keys, Keys):
+        return keys.state
+
+    state = 0
+    for key, bit in KEY_BITS.items():
+        if keys[key]:
+            state |= bit
+    if sum(map(bool, keys)) > bin(state).count('1'):
+        state |= OTHER_KEY
+    return state
+
+
+class Keys(object):
+    """
+    Stands in for what pg.key.get_pressed() returns, during a replay
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def __getitem__(self, key):
+        return bool(self.state & KEY_BITS.get(key, 0))
+
+
+class Recorder(object):
+    """
+    Keeps the key state of every frame; 'save' writes them to 'filename'
+    """
+
+    def __init__(self, filename, seed, fps):
+        self.filename = filename
+        self.seed = seed
+        self.fps = fps
+        self.runs = []
+        self.frames = 0
+
+    def record(self, keys):
+        state = key_state(keys)
+        if self.runs and self.runs[-1][1] == state and \
+                self.runs[-1][0] < 0xFFFF:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, state])
+        self.frames += 1
+
+    def save(self):
+        with open(self.filename, 'wb') as replay_file:
+            replay_file.write(HEADER.pack(MAGIC, REPLAY_VERSION, self.fps,
+                                          self.seed, self.frames))
+            for count, state in self.runs:
+                replay_file.write(RUN.pack(count, state))
+
+
+class Replayer(object):
+    """
+    Key states read from a replay file, handed out one frame at a time
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as replay_file:
+            blob = replay_file.read()
+
+        if len(blob) < HEADER.size:
+            raise ReplayError('{0}: not a replay file'.format(filename))
+        magic, version, self.fps, self.seed, self.frames = \
+            HEADER.unpack_from(blob)
+        if magic != MAGIC or version != REPLAY_VERSION:
+            raise ReplayError('{0}: not a replay file of version {1}'.format(
+                filename, REPLAY_VERSION))
+        if self.fps != c.FPS:
+            raise ReplayError('{0}: recorded at {1} frames per second'.format(
+                filename, self.fps))
+
+        self.states = []
+        for count, state in RUN.iter_unpack(blob[HEADER.size:]):
+            self.states.extend([state] * count)
+        if len(self.states) != self.frames:
+            raise ReplayError('{0}: truncated'.format(filename))
+
+        self.frame = 0
+        self.state = 0
+        self.keys = Keys(self.state)
+
+    def pressed(self):
+        """
+        The key source of setup.update_keys(): the keys of this frame
+        """
+        return self.keys
+
+    def replay_frame(self, events):
+        """
+        Move on to the keys of the next frame and return the events
+        of that frame: the key events that lead there from the last one,
+        and the QUIT events among 'events', the real ones.  A QUIT event
+        ends the replay.
+        """
+        events = [event for event in events if event.type == pg.QUIT]
+        if self.frame == self.frames:
+            return events + [pg.event.Event(pg.QUIT)]
+
+        state = self.states[self.frame]
+        self.frame += 1
+
+        for key in KEYS + [pg.K_UNKNOWN]:
+            bit = KEY_BITS.get(key, OTHER_KEY)
+            if state & bit and not self.state & bit:
+                events.append(pg.event.Event(pg.KEYDOWN, key=key))
+            elif self.state & bit and not state & bit:
+                events.append(pg.event.Event(pg.KEYUP, key=key))
+
+        self.state = state
+        self.keys = Keys(state)
+        setup.register_key_source(self.pressed)
+        setup.update_keys()
+        return events
+
+
+def frame_time_stats(frame_times):
+    """
+    Return a dict of the number of frames and the mean, p50, p90, p99 and
+    max of the frame times (in seconds) of a run, in milliseconds
+    """
+    times = sorted(frame_times)
+    if not times:
+        return {'frames': 0}
+
+    def percentile(p):
+        return times[min(len(times) - 1, int(len(times) * p / 100))] * 1000
+
+    return {'frames': len(times),
+            'mean': sum(times) / len(times) * 1000,
+            'p50': percentile(50),
+            'p90': percentile(90),
+            'p99': percentile(99),
+            'max': times[-1] * 1000}
+
+
+def frame_time_report(frame_times):
+    """
+    Summary of the frame times (in seconds) of a run, in milliseconds
+    """
+    stats = frame_time_stats(frame_times)
+    if not stats['frames']:
+        return 'no frames'
+
+    return ('{frames} frames, mean {mean:.3f} ms, p50 {p50:.3f} ms, '
+            'p90 {p90:.3f} ms, p99 {p99:.3f} ms, max {max:.3f} ms').format(
+                **stats)
@@ -0,0 +1,474 @@
+"""
+
+The save file format, and the save slots
+
+A save file is a header and the game data, encoded field by field in the
+order of FIELDS, the keys of a new game's data: the keys themselves are
+never written, only their values.  Keys a game picks up later on (the
+treasures found, 'brother elixir') follow, with their names.
+
+A value is a tag byte, then what the tag calls for:
+
+    0x00 - 0x0F  the type of the value (NONE, FALSE, TRUE, INT, FLOAT, STR,
+                 LIST, TUPLE, DICT, MISSING), then the value: a varint for
+                 INT, the length of a STR, LIST, TUPLE or DICT, its items
+    0x40 - 0x7F  the integers 0 to 63
+    0x80 - 0xFF  the strings of WORDS: the keys of the nested dicts, item
+                 names, state names; what the game data is mostly made of
+
+The header holds a magic number, the version of the format, the length of
+what follows and its CRC-32: a file cut short or damaged is refused with a
+SaveError instead of loading half a game.
+
+The game is saved in one of a few slots, a file each in the save
+directory, next to an index of the slots: when each one was saved, and
+the level, gold and whereabouts of the player.  The load menu reads the
+index, not the slots.
+
+FIELDS and WORDS are part of the format: changing them, or what the game
+data holds, means a new SAVE_VERSION, a schema for it in SCHEMAS and a
+function in MIGRATIONS that turns the game data of the last version into
+game data of the new one.  Version 0 is the pickled save.p of old.
+
+"""
+
+import collections
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+from . import tools
+from . import constants as c
+from .saving import write_atomic
+
+
+SAVE_VERSION = 1
+
+SAVE_DIR = 'saves'
+SLOTS = 3
+INDEX_FILE = 'index.dat'
+
+# where the game was saved before there were slots
+LEGACY_SAVE = 'save.p'
+
+SAVE_MAGIC = b'TSCS'
+INDEX_MAGIC = b'TSCI'
+
+# magic, version, length of the payload, CRC-32 of the payload
+HEADER = struct.Struct('<4sHII')
+
+FLOAT = struct.Struct('<d')
+
+(NONE, FALSE, TRUE, INT, FLOAT_TAG, STR, LIST, TUPLE, DICT,
+ MISSING) = range(10)
+SMALL_INT = 0x40
+SMALL_INTS = 64
+WORD = 0x80
+MAX_WORDS = 128
+
+
+# version 1: the keys of tools.new_game_data, in that order
+FIELDS_1 = (
+    'last location', 'last state', 'last direction', 'king item',
+    'old man item', 'player inventory', 'player stats', 'battle counter',
+    'treasure1', 'treasure2', 'treasure3', 'treasure4', 'treasure5',
+    'start of game', 'talked to king', 'brother quest complete',
+    'talked to sick brother', 'has brother elixir', 'elixir received',
+    'old man gift', 'battle type', 'crown quest', 'delivered crown',
+    'brother item')
+
+WORDS_1 = (
+    # keys of the nested dicts
+    'quantity', 'value', 'power', 'magic points', 'current', 'maximum',
+    'health', 'magic', 'Level', 'experience to next level',
+    'attack points', 'Defense Points', 'equipped weapon', 'equipped armor',
+    # items
+    'GOLD', 'ELIXIR', 'Healing Potion', 'Ether Potion', 'Rapier',
+    'Long Sword', 'Chain Mail', 'Wooden Shield', 'Cure', 'Fire Blast',
+    # directions
+    'up', 'down', 'left', 'right',
+    # states
+    c.TOWN, c.CASTLE, c.INN, c.POTION_SHOP, c.ARMOR_SHOP, c.WEAPON_SHOP,
+    c.MAGIC_SHOP, c.HOUSE, c.OVERWORLD, c.BROTHER_HOUSE, c.BATTLE,
+    c.DUNGEON, c.DUNGEON2, c.DUNGEON3, c.DUNGEON4, c.DUNGEON5,
+    # keys picked up along the way
+    'brother elixir', '')
+
+
+SlotInfo = collections.namedtuple('SlotInfo',
+                                  'slot saved level gold place')
+
+
+class SaveError(Exception):
+    pass
+
+
+def encode_varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(blob, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = blob[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Schema(object):
+    """
+    How the game data of one version of the format is encoded
+    """
+
+    def __init__(self, fields, words):
+        assert len(words) <= MAX_WORDS
+        self.fields = fields
+        self.words = words
+        self.codes = dict((word, WORD + i) for i, word in enumerate(words))
+
+    def encode(self, game_data):
+        """
+        Return the payload of a save file of 'game_data'
+        """
+        out = bytearray()
+        for field in self.fields:
+            if field in game_data:
+                self.encode_value(game_data[field], out)
+            else:
+                out.append(MISSING)
+
+        extras = [key for key in game_data if key not in self.fields]
+        encode_varint(len(extras), out)
+        for key in sorted(extras):
+            self.encode_value(key, out)
+            self.encode_value(game_data[key], out)
+        return bytes(out)
+
+    def decode(self, payload):
+        """
+        Return the game data of the payload of a save file
+        """
+        game_data = {}
+        pos = 0
+        for field in self.fields:
+            if payload[pos] == MISSING:
+                pos += 1
+            else:
+                game_data[field], pos = self.decode_value(payload, pos)
+
+        extras, pos = decode_varint(payload, pos)
+        for _ in range(extras):
+            key, pos = self.decode_value(payload, pos)
+            game_data[key], pos = self.decode_value(payload, pos)
+
+        if pos != len(payload):
+            raise SaveError('{0} bytes too many'.format(len(payload) - pos))
+        return game_data
+
+    def encode_value(self, value, out):
+        kind = type(value)
+        if value is None:
+            out.append(NONE)
+        elif kind is bool:
+            out.append(TRUE if value else FALSE)
+        elif kind is int:
+            if 0 <= value < SMALL_INTS:
+                out.append(SMALL_INT + value)
+            else:
+                out.append(INT)
+                # zigzag: small negative numbers stay short
+                encode_varint(value * 2 if value >= 0 else -value * 2 - 1,
+                              out)
+        elif kind is float:
+            out.append(FLOAT_TAG)
+            out += FLOAT.pack(value)
+        elif kind is str:
+            code = self.codes.get(value)
+            if code is not None:
+                out.append(code)
+            else:
+                data = value.encode('utf-8')
+                out.append(STR)
+                encode_varint(len(data), out)
+                out += data
+        elif kind is list or kind is tuple:
+            out.append(LIST if kind is list else TUPLE)
+            encode_varint(len(value), out)
+            for item in value:
+                self.encode_value(item, out)
+        elif kind is dict:
+            out.append(DICT)
+            encode_varint(len(value), out)
+            for key, item in value.items():
+                self.encode_value(key, out)
+                self.encode_value(item, out)
+        else:
+            raise SaveError('cannot save a {0}: {1!r}'.format(
+                kind.__name__, value))
+
+    def decode_value(self, payload, pos):
+        tag = payload[pos]
+        pos += 1
+        if tag >= WORD:
+            return self.words[tag - WORD], pos
+        if tag >= SMALL_INT:
+            return tag - SMALL_INT, pos
+        if tag == NONE:
+            return None, pos
+        if tag == FALSE:
+            return False, pos
+        if tag == TRUE:
+            return True, pos
+        if tag == INT:
+            value, pos = decode_varint(payload, pos)
+            return (value >> 1) ^ -(value & 1), pos
+        if tag == FLOAT_TAG:
+            return FLOAT.unpack_from(payload, pos)[0], pos + FLOAT.size
+
+        length, pos = decode_varint(payload, pos)
+        if tag == STR:
+            end = pos + length
+            return payload[pos:end].decode('utf-8'), end
+        if tag == LIST or tag == TUPLE:
+            items = []
+            for _ in range(length):
+                item, pos = self.decode_value(payload, pos)
+                items.append(item)
+            return (items if tag == LIST else tuple(items)), pos
+        if tag == DICT:
+            value = {}
+            for _ in range(length):
+                key, pos = self.decode_value(payload, pos)
+                value[key], pos = self.decode_value(payload, pos)
+            return value, pos
+        raise SaveError('unknown tag {0:#x}'.format(tag))
+
+
+SCHEMAS = {1: Schema(FIELDS_1, WORDS_1)}
+
+
+def migrate_legacy(game_data):
+    """
+    Version 0 to 1: the pickled save.p of old, from before some of the
+    keys of a new game's data were there
+    """
+    new_game = tools.new_game_data()
+    new_game.update(game_data)
+    return new_game
+
+
+# version: function from the game data of that version to the next one
+MIGRATIONS = {0: migrate_legacy}
+
+
+def migrate(game_data, version):
+    """
+    Bring the game data of 'version' up to SAVE_VERSION
+    """
+    while version < SAVE_VERSION:
+        game_data = MIGRATIONS[version](game_data)
+        version += 1
+    return game_data
+
+
+def pack(magic, payload, version=SAVE_VERSION):
+    return HEADER.pack(magic, version, len(payload),
+                       zlib.crc32(payload)) + payload
+
+
+def unpack(magic, blob, name):
+    """
+    Return (version, payload) of the file 'name' read into 'blob'; raise a
+    SaveError if it is not a whole, undamaged file of 'magic'
+    """
+    if len(blob) < HEADER.size:
+        raise SaveError('{0}: not a save file'.format(name))
+    file_magic, version, length, crc = HEADER.unpack_from(blob)
+    if file_magic != magic:
+        raise SaveError('{0}: not a save file'.format(name))
+    if version not in SCHEMAS:
+        raise SaveError('{0}: unknown version {1}'.format(name, version))
+
+    payload = blob[HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise SaveError('{0}: damaged'.format(name))
+    return version, payload
+
+
+def dumps(game_data):
+    """
+    Return the bytes of a save file of 'game_data'
+    """
+    return pack(SAVE_MAGIC, SCHEMAS[SAVE_VERSION].encode(game_data))
+
+
+def loads(blob, name='save file'):
+    """
+    Return the game data of the bytes of a save file, of any version
+    """
+    version, payload = unpack(SAVE_MAGIC, blob, name)
+    try:
+        game_data = SCHEMAS[version].decode(payload)
+    except (IndexError, UnicodeDecodeError, struct.error) as error:
+        raise SaveError('{0}: {1}'.format(name, error))
+    return migrate(game_data, version)
+
+
+def slot_info(slot, saved, game_data):
+    """
+    The index entry of the game data of 'slot', saved at time 'saved'
+    """
+    stats = game_data.get('player stats', {})
+    gold = game_data.get('player inventory', {}).get('GOLD', {})
+    return SlotInfo(slot, saved, stats.get('Level', 1),
+                    gold.get('quantity', 0),
+                    game_data.get('last state') or '')
+
+
+class SaveSlots(object):
+    """
+    The save slots, numbered from 1, in 'directory'; 'current' is the one
+    the game being played saves in
+    """
+
+    def __init__(self, directory=SAVE_DIR, slots=SLOTS):
+        self.directory = directory
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.current = 1
+        self.reload()
+
+    def path(self, slot):
+        return os.path.join(self.directory, 'slot{0}.sav'.format(slot))
+
+    def reload(self):
+        """
+        Read the index again, or rebuild it from the slots if it is
+        missing or damaged; the latest slot becomes the current one
+        """
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        with self.lock:
+            try:
+                with open(index_path, 'rb') as index_file:
+                    blob = index_file.read()
+                version, payload = unpack(INDEX_MAGIC, blob, index_path)
+                entries = SCHEMAS[version].decode_value(payload, 0)[0]
+                self.entries = dict((entry[0], SlotInfo(*entry))
+                                    for entry in entries)
+            except (IOError, OSError, SaveError, IndexError, TypeError):
+                self.rebuild_index()
+        self.current = self.latest() or 1
+
+    def rebuild_index(self):
+        self.entries = {}
+        for slot in range(1, self.slots + 1):
+            path = self.path(slot)
+            if not os.path.isfile(path):
+                continue
+            try:
+                game_data = self.load(slot)
+            except SaveError as error:
+                print('Skipping save slot {0}: {1}'.format(slot, error))
+                continue
+            self.entries[slot] = slot_info(slot, os.path.getmtime(path),
+                                           game_data)
+        if os.path.isdir(self.directory):
+            self.write_index()
+
+    def write_index(self):
+        entries = [tuple(self.entries[slot]) for slot in sorted(self.entries)]
+        out = bytearray()
+        SCHEMAS[SAVE_VERSION].encode_value(entries, out)
+        write_atomic(os.path.join(self.directory, INDEX_FILE),
+                     pack(INDEX_MAGIC, bytes(out)))
+
+    def index(self):
+        """
+        Return the SlotInfo of every slot in use, by slot number
+        """
+        with self.lock:
+            return [self.entries[slot] for slot in sorted(self.entries)]
+
+    def latest(self):
+        """
+        The slot saved last, or None if none is in use
+        """
+        with self.lock:
+            if not self.entries:
+                return None
+            return max(self.entries.values(), key=lambda info: info.saved)[0]
+
+    def free_slot(self):
+        """
+        A slot for a new game: the first one not in use, or None if every
+        slot is; which save to give up is for the player to say
+        """
+        with self.lock:
+            for slot in range(1, self.slots + 1):
+                if slot not in self.entries:
+                    return slot
+            return None
+
+    def load(self, slot):
+        """
+        Return the game data saved in 'slot'; raise a SaveError if there
+        is none or it is damaged
+        """
+        path = self.path(slot)
+        try:
+            with open(path, 'rb') as save_file:
+                blob = save_file.read()
+        except (IOError, OSError) as error:
+            raise SaveError('{0}: {1}'.format(path, error))
+        return loads(blob, path)
+
+    def write(self, slot, game_data):
+        """
+        Save 'game_data' in 'slot', then update the index; each file is
+        replaced all or nothing
+        """
+        data = dumps(game_data)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        write_atomic(self.path(slot), data)
+        with self.lock:
+            self.entries[slot] = slot_info(slot, time.time(), game_data)
+            self.write_index()
+
+    def migrate_legacy(self, filename=LEGACY_SAVE):
+        """
+        Move the pickled save file 'filename' of old, if there is one, into
+        a free slot, and rename it out of the way; return the slot
+        """
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with open(filename, 'rb') as save_file:
+                game_data = pickle.load(save_file)
+        except (IOError, OSError, pickle.UnpicklingError, EOFError) as error:
+            print('Cannot read the old save file {0}: {1}'.format(
+                filename, error))
+            return None
+
+        slot = self.free_slot()
+        if slot is None:
+            print('Every save slot is in use; the old save file {0} is '
+                  'left where it is'.format(filename))
+            return None
+        self.write(slot, migrate(game_data, 0))
+        os.replace(filename, filename + '.old')
+        self.current = slot
+        print('Moved the old save file {0} to save slot {1}'.format(
+            filename, slot))
+        return slot
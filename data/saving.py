@@ -0,0 +1,96 @@
+"""
+
+Saving the game in the background
+
+Saving used to pickle the game data straight into the save file on the
+frame thread.  A SaveService takes a copy of the game data on the frame
+thread (a small dict of dicts, quick to copy) and leaves the rest to a
+thread of its own: encoding, writing to a temporary file next to the save
+file, fsync, and renaming it over the save file.  The rename is atomic, so
+a crash or a power cut mid-write leaves the old save, never half a new one.
+
+Saves of the same slot that pile up while the thread is busy are merged:
+only the latest one is written.  Anything that reads the saves calls
+'flush' first, to wait for the saves still on their way.
+
+"""
+
+import copy
+import os
+import threading
+
+
+def write_atomic(filename, data):
+    """
+    Replace the file 'filename' with the bytes 'data', all or nothing
+    """
+    temp_path = filename + '.tmp'
+    with open(temp_path, 'wb') as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, filename)
+
+    # make the rename itself durable
+    if hasattr(os, 'O_DIRECTORY'):
+        directory = os.open(os.path.dirname(os.path.abspath(filename)),
+                            os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+class SaveService(object):
+    """
+    Writes snapshots of the game data to save slots on a background thread
+    """
+
+    def __init__(self, write):
+        # write(slot, snapshot) puts a snapshot in a slot, like
+        # savefile.SaveSlots.write
+        self.write = write
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.writing = 0
+        self.thread = None
+
+    def save(self, game_data, slot):
+        """
+        Save a snapshot of 'game_data' in 'slot'; returns at once
+        """
+        snapshot = copy.deepcopy(game_data)
+        with self.condition:
+            self.pending[slot] = snapshot
+            self.condition.notify_all()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='save service')
+                self.thread.daemon = True
+                self.thread.start()
+
+    def flush(self):
+        """
+        Wait until every save so far is on disk
+        """
+        with self.condition:
+            while self.pending or self.writing:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                slot, snapshot = self.pending.popitem()
+                self.writing += 1
+
+            try:
+                self.write(slot, snapshot)
+            except Exception as error:
+                msg = "Cannot save the game in slot {0}: {1}"
+                print(msg.format(slot, error))
+            finally:
+                with self.condition:
+                    self.writing -= 1
+                    self.condition.notify_all()
@@ -0,0 +1,85 @@
+"""
+
+The game session: what one run of the game shares besides the game data
+
+For now that is the random numbers.  Every part of the game that rolls
+dice draws from a stream of its own, by name:
+
+    'battle'      experience, gold, enemies and damage in battles
+    'encounters'  steps until the next random battle
+    'wandering'   where the wandering NPCs go
+    'sound'       which of a few sound effects is played
+
+All the streams follow from the session seed, each one independent of the
+others: the same seed gives the same rolls in every run, and drawing more
+from one stream (an NPC taking one more step while a battle goes on, say)
+doesn't change what the others give.
+
+"""
+
+import hashlib
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def stream_seed(seed, name):
+    """
+    Seed of the stream 'name' of a session seeded with 'seed'; the same in
+    every process (unlike hash())
+    """
+    digest = hashlib.sha256('{0}:{1}'.format(seed, name).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+class Stream(random.Random):
+    """
+    A named random stream: a random.Random, with bulk draws for batched
+    simulations
+
+    The bulk draws come from a numpy generator seeded like the stream, and
+    only with numpy; they don't change what the single draws give.
+    """
+
+    def __init__(self, name, seed):
+        self.name = name
+        self.generator = None
+        super(Stream, self).__init__(seed)
+
+    def seed(self, a=None, version=2):
+        super(Stream, self).seed(a, version)
+        if np is not None:
+            self.generator = np.random.default_rng(a)
+
+    def randints(self, low, high, size=None):
+        """
+        Like randint(low, high), 'size' times: an array of rolls between
+        'low' and 'high', both included.  'low' and 'high' may be arrays
+        of bounds, one pair per roll.  Needs numpy.
+        """
+        if self.generator is None:
+            raise ImportError('bulk draws need numpy')
+        return self.generator.integers(low, np.add(high, 1), size=size)
+
+
+class Session(object):
+    """
+    One run of the game, seeded with 'seed' (a random one if None)
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.streams = {}
+
+    def rng(self, name):
+        """
+        Return the random stream 'name', made on first use
+        """
+        if name not in self.streams:
+            self.streams[name] = Stream(name, stream_seed(self.seed, name))
+        return self.streams[name]
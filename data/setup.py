@@ -11,6 +11,11 @@ import pygame as pg
 
 SCREEN = None
 SCREEN_RECT = None
+DIRTY_RECTS = None
+
+# a tools.VirtualClock in headless runs; None for real time
+CLOCK = None
+DRAWING = True
 
 FONTS = None
 GFX = None
@@ -18,7 +23,16 @@ SFX = None
 TMX = None
 FONT = None
 
+SESSION = None
+
+# the savefile.SaveSlots the game is saved in, and the saving.SaveService
+# that writes them
+SAVE_SLOTS = None
+SAVER = None
+
 KEYS = None
+# pg.key.get_pressed, or what stands in for it in a replay
+KEY_SOURCE = pg.key.get_pressed
 GAME_DATA = None
 
 MIXER = None
@@ -44,13 +58,38 @@ def register_mixer(_mixer):
     global MIXER
     MIXER = _mixer
 
+def register_key_source(_key_source):
+    global KEY_SOURCE
+    KEY_SOURCE = _key_source
+
 def update_keys():
     global KEYS
-    KEYS = pg.key.get_pressed()
+    KEYS = KEY_SOURCE()
 
 def keys():
     return KEYS
 
+def register_session(_session):
+    global SESSION
+    SESSION = _session
+
+def session():
+    return SESSION
+
+def register_save_slots(_save_slots):
+    global SAVE_SLOTS
+    SAVE_SLOTS = _save_slots
+
+def save_slots():
+    return SAVE_SLOTS
+
+def register_saver(_saver):
+    global SAVER
+    SAVER = _saver
+
+def saver():
+    return SAVER
+
 def register_game_data(_game_data):
     global GAME_DATA
     GAME_DATA = _game_data
@@ -62,6 +101,18 @@ def register_screen(_screen):
     global SCREEN
     SCREEN = _screen
 
+def register_dirty_rects(_dirty_rects):
+    global DIRTY_RECTS
+    DIRTY_RECTS = _dirty_rects
+
+def register_clock(_clock):
+    global CLOCK
+    CLOCK = _clock
+
+def register_drawing(_drawing):
+    global DRAWING
+    DRAWING = _drawing
+
 def register_screen_rect(_screen_rect):
     global SCREEN_RECT
     SCREEN_RECT = _screen_rect
@@ -92,6 +143,15 @@ def screen():
 def screen_rect():
     return SCREEN_RECT
 
+def dirty_rects():
+    return DIRTY_RECTS
+
+def clock():
+    return CLOCK
+
+def drawing():
+    return DRAWING
+
 def fonts():
     return FONTS
 
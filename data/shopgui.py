@@ -3,7 +3,6 @@ This class controls the textbox GUI for any shop state.
 A Gui object is created and updated by the shop state.
 """
 
-import pickle
 import pygame as pg
 from . import setup, observer
 from . components import textbox
@@ -85,16 +84,19 @@ class Gui(object):
         sprite = pg.sprite.Sprite()
         sprite.image = surface
         sprite.rect = rect
-        self.check_to_draw_arrow(sprite)
+        sprite.content = (dialogue_list[index],
+                          self.check_to_draw_arrow(sprite))
 
         return sprite
 
     def check_to_draw_arrow(self, sprite):
         """
-        Blink arrow if more text needs to be read.
+        Blink arrow if more text needs to be read; return whether it did.
         """
         if self.index < len(self.dialogue['dialogue']) - 1:
             sprite.image.blit(self.arrow.image, self.arrow.rect)
+            return True
+        return False
 
     def make_gold_box(self):
         """Make the box to display total gold"""
@@ -114,6 +116,7 @@ class Gui(object):
         sprite = pg.sprite.Sprite()
         sprite.image = surface
         sprite.rect = rect
+        sprite.content = gold
 
         return sprite
 
@@ -150,6 +153,7 @@ class Gui(object):
         sprite = pg.sprite.Sprite()
         sprite.image = surface
         sprite.rect = rect
+        sprite.content = tuple(choices)
 
         return sprite
 
@@ -367,8 +371,7 @@ class Gui(object):
         elif item_type == 'room':
             player_health['current'] = player_health['maximum']
             player_magic['current'] = player_magic['maximum']
-            with open("save.p", "wb") as save_file:
-                pickle.dump(game_data, save_file)
+            setup.saver().save(game_data, setup.save_slots().current)
         elif item_type == 'breakfast':
             player_health['current'] = player_health['maximum']
             player_magic['current'] = player_magic['maximum']
@@ -701,11 +704,15 @@ class Gui(object):
         state_list2 = [
             'select', 'confirmpurchase', 'buysell', 'sell', 'confirmsell']
 
-        surface = setup.screen()
+        dirty = setup.dirty_rects()
 
-        surface.blit(self.dialogue_box.image, self.dialogue_box.rect)
-        surface.blit(self.gold_box.image, self.gold_box.rect)
+        dirty.blit('dialogue box', self.dialogue_box.image,
+                   self.dialogue_box.rect, self.dialogue_box.content)
+        dirty.blit('gold box', self.gold_box.image, self.gold_box.rect,
+                   self.gold_box.content)
         if self.state in state_list2:
-            surface.blit(self.selection_box.image, self.selection_box.rect)
-            surface.blit(self.selection_arrow.image, self.selection_arrow.rect)
+            dirty.blit('selection box', self.selection_box.image,
+                       self.selection_box.rect, self.selection_box.content)
+            dirty.blit('selection arrow',
+                       self.selection_arrow.image, self.selection_arrow.rect)
 
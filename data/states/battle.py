@@ -1,6 +1,5 @@
 """This is the state that handles battles against
 monsters"""
-import random
 import pygame as pg
 from .. import tools, battlegui, observer, setup
 from .. components import person, attack, attackitems
@@ -8,6 +7,9 @@ from .. import constants as c
 from ..tools import Timer, empty_background
 
 class Battle(tools.State):
+    assets = ('player', 'devil', 'evilwizard', 'battlestatbox', 'shopbox',
+              'goldbox', 'smallarrow', 'shopsigns', 'sword2', 'explosion')
+
     def __init__(self):
         super(Battle, self).__init__()
 
@@ -107,7 +109,8 @@ class Battle(tools.State):
         Calculate experience points based on number of enemies
         and their levels.
         """
-        experience_total = sum([random.randint(5, 10)
+        rolls = setup.session().rng('battle')
+        experience_total = sum([rolls.randint(5, 10)
                                 for enemy
                                 in self.enemy_list])
 
@@ -119,11 +122,12 @@ class Battle(tools.State):
         """
         Calculate the gold collected at the end of the battle.
         """
+        rolls = setup.session().rng('battle')
         gold = 0
 
         for enemy in self.enemy_list:
             max_gold = enemy.level * 20
-            gold += (random.randint(1, max_gold))
+            gold += (rolls.randint(1, max_gold))
 
         return gold
 
@@ -153,7 +157,8 @@ class Battle(tools.State):
                                                  'battle resting'))
                 game_data['start of game'] = False
             else:
-                for enemy in range(random.randint(1, 2)):
+                rolls = setup.session().rng('battle')
+                for enemy in range(rolls.randint(1, 2)):
                     enemy_group.add(person.Enemy('devil', (0, 0),
                                                  'battle resting'))
 
@@ -211,7 +216,9 @@ class Battle(tools.State):
         self.damage_points.update()
         self.execute_player_actions()
 
-        self.draw_battle()
+        if setup.drawing():
+            self.draw_battle()
+        self.draw_transition()
 
     def check_input(self):
         """
@@ -413,7 +420,8 @@ class Battle(tools.State):
         print("END PRE", game_data['last state'])
         game_data['last state'] = self.name
         print("END POST", game_data['last state'])
-        game_data['battle counter'] = random.randint(50, 255)
+        encounters = setup.session().rng('encounters')
+        game_data['battle counter'] = encounters.randint(50, 255)
         game_data['battle type'] = None
         self.state = 'transition out'
 
@@ -437,19 +445,19 @@ class Battle(tools.State):
     def draw_battle(self):
         """Draw all elements of battle state"""
 
-        surface = setup.screen()
+        dirty = setup.dirty_rects()
 
-        self.background.draw(surface)
-        self.enemy_group.draw(surface)
-        self.attack_animations.draw(surface)
+        dirty.draw_group('background', self.background)
+        dirty.draw_group('enemies', self.enemy_group)
+        dirty.draw_group('attack animations', self.attack_animations)
         self.sword.draw()
-        surface.blit(self.player.image, self.player.rect)
-        surface.blit(self.info_box.image, self.info_box.rect)
-        surface.blit(self.select_box.image, self.select_box.rect)
-        surface.blit(self.arrow.image, self.arrow.rect)
+        dirty.blit('player', self.player.image, self.player.rect)
+        dirty.blit('info box', self.info_box.image, self.info_box.rect,
+                   self.info_box.content)
+        dirty.blit('select box', self.select_box.image, self.select_box.rect)
+        dirty.blit('arrow', self.arrow.image, self.arrow.rect)
         self.player_health_box.draw()
-        self.damage_points.draw(surface)
-        self.draw_transition()
+        dirty.draw_group('damage points', self.damage_points)
 
     def draw_transition(self):
         """
@@ -555,8 +563,9 @@ class Battle(tools.State):
         power = self.inventory['Fire Blast']['power']
         magic_points = self.inventory['Fire Blast']['magic points']
         game_data['player stats']['magic']['current'] -= magic_points
+        rolls = setup.session().rng('battle')
         for enemy in self.enemy_list:
-            damage = random.randint(power//2, power)
+            damage = rolls.randint(power//2, power)
             self.damage_points.add(
                 attackitems.HealthPoints(damage, enemy.rect.topright))
             enemy.health -= damage
@@ -721,7 +730,7 @@ class Battle(tools.State):
         self.action_timer.reset()
         self.player_damaged(player_damage)
         if player_damage:
-            sfx_num = random.randint(1, 3)
+            sfx_num = setup.session().rng('sound').randint(1, 3)
             self.notify('punch{}'.format(sfx_num))
             self.player.damaged = True
             self.player.enter_knock_back_state()
@@ -4,9 +4,8 @@ Game Over / 'Restart from last save point?' pseudo-"room"
 
 """
 
-import pickle, os
 import pygame as pg
-from .. import setup, tools
+from .. import setup, tools, savefile
 from .. import observer
 from ..components import person
 from .. import constants as c
@@ -63,6 +62,8 @@ class DeathScene(tools.State):
     """
     Scene when the player has died.
     """
+    assets = ('player', 'smallarrow', 'dialoguebox')
+
     def __init__(self):
         super(DeathScene, self).__init__()
 
@@ -84,7 +85,7 @@ class DeathScene(tools.State):
         self.font = pg.font.Font(setup.FONTS[c.MAIN_FONT], 22)
         self.background = pg.Surface(setup.SCREEN_RECT.size)
         self.background.fill(c.BLACK_BLUE)
-        self.player = person.Player('down', 1, 1, 'resting', 1)
+        self.player = person.Player(index=1)
         self.player.image = pg.transform.scale2x(self.player.image)
         self.player.rect = self.player.image.get_rect()
         self.player.rect.center = setup.SCREEN_RECT.center
@@ -93,11 +94,12 @@ class DeathScene(tools.State):
         self.state_dict = self.make_state_dict()
         self.state = c.TRANSITION_IN
         self.alpha = 255
-        if not os.path.isfile("save.p"):
+        slots = setup.save_slots()
+        setup.saver().flush()
+        if slots.current not in [info.slot for info in slots.index()]:
             # initializes setup.game_data internally
             tools.create_game_data_dict()
-            with open("save.p", "wb") as save_file:
-                pickle.dump(setup.game_data(), save_file)
+            setup.saver().save(setup.game_data(), slots.current)
         self.observers = [observer.SoundEffects()]
 
     def notify(self, event):
@@ -163,8 +165,15 @@ class DeathScene(tools.State):
         if keys[pg.K_SPACE]:
             if self.arrow.index == 0:
                 self.next = c.TOWN
-                with open("save.p", "rb") as save_file:
-                    setup.register_game_data(pickle.load(save_file))
+                slots = setup.save_slots()
+                setup.saver().flush()
+                try:
+                    setup.register_game_data(slots.load(slots.current))
+                except savefile.SaveError as error:
+                    # start over then
+                    print(error)
+                    tools.create_game_data_dict()
+                    self.next = c.OVERWORLD
             elif self.arrow.index == 1:
                 self.next = c.MAIN_MENU
             self.state = c.TRANSITION_OUT
@@ -175,10 +184,12 @@ class DeathScene(tools.State):
         Draw background, player, and message box.
         """
 
-        surface = setup.screen()
+        if not setup.drawing():
+            return
+
+        dirty = setup.dirty_rects()
 
-        surface.blit(self.background, (0, 0))
-        surface.blit(self.player.image, self.player.rect)
-        surface.blit(self.message_box.image, self.message_box.rect)
-        surface.blit(self.arrow.image, self.arrow.rect)
-        surface.blit(self.transition_surface, (0, 0))
+        dirty.blit('background', self.background, (0, 0))
+        dirty.blit('player', self.player.image, self.player.rect)
+        dirty.blit('message box', self.message_box.image, self.message_box.rect)
+        dirty.blit('arrow', self.arrow.image, self.arrow.rect)
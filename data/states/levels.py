@@ -7,14 +7,20 @@ found in the tools.py module.
 """
 import copy
 import pygame as pg
-from .. import tools, collision
+from .. import tools, collision, pathfinding
 from .. import constants as c
-from .. components import person, textbox, portal
+from .. components import person, textbox, portal, crowd
 from . import player_menu
 from .. import tilerender
 from .. import setup
 
 class LevelState(tools.State):
+    # make_sprites makes a person of every kind for every sprite of a map
+    assets = ('player', 'oldman', 'femalevillager', 'femvillager2', 'devil',
+              'oldmanbrother', 'soldier', 'king', 'evilwizard',
+              'treasurechest', 'dialoguebox', 'fancyarrow', 'goldbox',
+              'playerstatsbox', 'shopsigns', 'smallarrow', 'crown')
+
     def __init__(self, name, battles=False):
         super(LevelState, self).__init__()
 
@@ -22,7 +28,6 @@ class LevelState(tools.State):
         self.menu_screen = None
         self.level_rect = None
         self.use_portal = None
-        self.level_surface = None
         self.blockers = None
         self.dialogue_handler = None
         self.player = None
@@ -32,8 +37,15 @@ class LevelState(tools.State):
         self.cut_off_bottom_map = None
         self.state_dict = None
         self.sprites = None
+        self.solo_sprites = None
+        self.awake_sprites = None
+        self.sleep_frames = None
+        self.frame_count = None
+        self.crowd = None
+        self.reservations = None
+        self.pathfinder = None
         self.allow_input = None
-        self.map_image = None
+        self.map_chunks = None
         self.renderer = None
         self.portals = None
 
@@ -56,21 +68,40 @@ class LevelState(tools.State):
         self.allow_input = False
         self.cut_off_bottom_map = ['castle', 'town', 'dungeon']
         self.renderer = tilerender.Renderer(self.tmx_map)
-        self.map_image = self.renderer.make_2x_map()
+        self.map_chunks = self.renderer.make_2x_chunks()
 
-        self.viewport = make_viewport(self.map_image)
-        self.level_surface = self.make_level_surface(self.map_image)
-        self.level_rect = self.level_surface.get_rect()
+        self.viewport = make_viewport(self.map_chunks)
+        self.level_rect = self.make_level_rect(self.map_chunks)
         self.portals = self.make_level_portals()
         self.player = self.make_player()
         self.blockers = self.make_blockers()
         self.sprites = self.make_sprites()
+        self.reservations = collision.TileReservations(self.sprites)
+        self.pathfinder = pathfinding.Pathfinder(
+            self.name, self.level_rect.size, self.blockers, self.portals)
+        for sprite in self.sprites:
+            sprite.pathfinder = self.pathfinder
+        self.crowd = crowd.make_crowd(self.sprites, self)
+        self.solo_sprites = self.make_solo_sprites()
+        self.awake_sprites = pg.sprite.Group(self.solo_sprites)
+        # sleeping sprite: frames it is behind
+        self.sleep_frames = {}
+        self.frame_count = 0
 
         self.collision_handler = collision.CollisionHandler(self)
         self.dialogue_handler = textbox.TextHandler(self)
         self.state_dict = self.make_state_dict()
         self.menu_screen = player_menu.PlayerMenu(self)
 
+    def likely_next(self):
+        """
+        The levels the portals lead to, and battles where there are any.
+        """
+        names = [portal.name for portal in self.portals]
+        if self.allow_battles:
+            names.append(c.BATTLE)
+        return names
+
     def set_music(self):
         """
         Set music based on name.
@@ -95,19 +126,15 @@ class LevelState(tools.State):
             #volume = music_dict[self.name][1]
             setup.mixer().set_level_song(self.name, music)
 
-    def make_level_surface(self, map_image):
+    def make_level_rect(self, map_image):
         """
-        Create the surface all images are blitted to.
+        Create the rect of the level the viewport is kept in.
         """
         map_rect = map_image.get_rect()
-        map_width = map_rect.width
         if self.name in self.cut_off_bottom_map:
-            map_height = map_rect.height - 32
-        else:
-            map_height = map_rect.height
-        size = map_width, map_height
+            map_rect.height -= 32
 
-        return pg.Surface(size).convert()
+        return map_rect
 
     def make_player(self):
         """
@@ -127,16 +154,15 @@ class LevelState(tools.State):
             player.rect.y = game_data['last location'][1] * 32
 
         else:
-            for obj in self.renderer.tmx_data.get_objects():
+            for obj in self.renderer.tmx_data.objects_named('start point'):
                 properties = obj.__dict__
-                if properties['name'] == 'start point':
-                    if last_state == properties['state']:
-                        posx = properties['x'] * 2
-                        posy = (properties['y'] * 2) - 32
-                        #player = person.Player(properties['direction'])
-                        player = person.Player()
-                        player.rect.x = posx
-                        player.rect.y = posy
+                if last_state == properties['state']:
+                    posx = properties['x'] * 2
+                    posy = (properties['y'] * 2) - 32
+                    #player = person.Player(properties['direction'])
+                    player = person.Player()
+                    player.rect.x = posx
+                    player.rect.y = posy
 
         return player
 
@@ -149,16 +175,24 @@ class LevelState(tools.State):
         """
         blockers = []
 
-        for obj in self.renderer.tmx_data.get_objects():
+        for obj in self.renderer.tmx_data.objects_named('blocker'):
             properties = obj.__dict__
-            if properties['name'] == 'blocker':
-                left = properties['x'] * 2
-                top = ((properties['y']) * 2) - 32
-                blocker = pg.Rect(left, top, 32, 32)
-                blockers.append(blocker)
+            left = properties['x'] * 2
+            top = ((properties['y']) * 2) - 32
+            blocker = pg.Rect(left, top, 32, 32)
+            blockers.append(blocker)
 
         return blockers
 
+    def make_solo_sprites(self):
+        """
+        Make the group of sprites updated one by one: all but the crowd.
+        """
+        if self.crowd is None:
+            return pg.sprite.Group(self.sprites)
+        return pg.sprite.Group(
+            [sprite for sprite in self.sprites if sprite not in self.crowd])
+
     def make_sprites(self):
         """
         Make any sprites for the level as needed.
@@ -168,89 +202,88 @@ class LevelState(tools.State):
         """
         sprites = pg.sprite.Group()
 
-        for obj in self.renderer.tmx_data.get_objects():
+        for obj in self.renderer.tmx_data.objects_named('sprite'):
             properties = obj.__dict__
-            if properties['name'] == 'sprite':
-                if 'direction' in properties:
-                    direction = properties['direction']
-                else:
-                    direction = 'down'
-
-                if properties['type'] == 'soldier' and direction == 'left':
-                    index = 1
-                else:
-                    index = 0
-
-                if 'item' in properties:
-                    item = properties['item']
-                else:
-                    item = None
-
-                if 'id' in properties:
-                    identifier = properties['id']
-                else:
-                    identifier = None
-
-                if 'battle' in properties:
-                    battle = properties['battle']
-                else:
-                    battle = None
-
-                if 'state' in properties:
-                    sprite_state = properties['state']
-                else:
-                    sprite_state = None
-
-
-                pos_x = properties['x'] * 2
-                pos_y = ((properties['y']) * 2) - 32
-
-                sprite_dict = {'oldman': person.Person('oldman',
-                                                       (pos_x, pos_y)),
-                               'bluedressgirl': person.Person(
-                                   'femalevillager', (pos_x, pos_y)),
-                               'femalewarrior': person.Person(
-                                   'femvillager2', (pos_x, pos_y),
-                                   'autoresting'),
-                               'devil': person.Person('devil', (pos_x, pos_y),
-                                                      'autoresting'),
-                               'oldmanbrother': person.Person(
-                                   'oldmanbrother', (pos_x, pos_y)),
-                               'soldier': person.Person(
-                                   'soldier', (pos_x, pos_y)),
-                               'king': person.Person('king', (pos_x, pos_y)),
-                               'evilwizard': person.Person(
-                                   'evilwizard', (pos_x, pos_y)),
-                               'treasurechest': person.Chest((pos_x, pos_y),
-                                                             identifier)}
-
-                sprite = sprite_dict[properties['type']]
-                if sprite_state:
-                    sprite.state = sprite_state
-
-                game_data = setup.game_data()
-
-                if sprite.name == 'oldman':
-                    if (
-                            game_data['old man gift'] and not
-                            game_data['elixir received']):
-                        sprite.item = game_data['old man gift']
-                    else:
-                        sprite.item = item
-                elif sprite.name == 'king':
-                    if not game_data['talked to king']:
-                        sprite.item = game_data['king item']
-                else:
-                    sprite.item = item
-                sprite.battle = battle
-                self.assign_dialogue(sprite, properties)
-                self.check_for_opened_chest(sprite)
+            if 'direction' in properties:
+                direction = properties['direction']
+            else:
+                direction = 'down'
+
+            if properties['type'] == 'soldier' and direction == 'left':
+                index = 1
+            else:
+                index = 0
+
+            if 'item' in properties:
+                item = properties['item']
+            else:
+                item = None
+
+            if 'id' in properties:
+                identifier = properties['id']
+            else:
+                identifier = None
+
+            if 'battle' in properties:
+                battle = properties['battle']
+            else:
+                battle = None
+
+            if 'state' in properties:
+                sprite_state = properties['state']
+            else:
+                sprite_state = None
+
+
+            pos_x = properties['x'] * 2
+            pos_y = ((properties['y']) * 2) - 32
+
+            sprite_dict = {'oldman': person.Person('oldman',
+                                                   (pos_x, pos_y)),
+                           'bluedressgirl': person.Person(
+                               'femalevillager', (pos_x, pos_y)),
+                           'femalewarrior': person.Person(
+                               'femvillager2', (pos_x, pos_y),
+                               'autoresting'),
+                           'devil': person.Person('devil', (pos_x, pos_y),
+                                                  'autoresting'),
+                           'oldmanbrother': person.Person(
+                               'oldmanbrother', (pos_x, pos_y)),
+                           'soldier': person.Person(
+                               'soldier', (pos_x, pos_y)),
+                           'king': person.Person('king', (pos_x, pos_y)),
+                           'evilwizard': person.Person(
+                               'evilwizard', (pos_x, pos_y)),
+                           'treasurechest': person.Chest((pos_x, pos_y),
+                                                         identifier)}
+
+            sprite = sprite_dict[properties['type']]
+            if sprite_state:
+                sprite.state = sprite_state
+
+            game_data = setup.game_data()
+
+            if sprite.name == 'oldman':
                 if (
-                        sprite.name == 'evilwizard' and
-                        game_data['crown quest']):
-                    pass
+                        game_data['old man gift'] and not
+                        game_data['elixir received']):
+                    sprite.item = game_data['old man gift']
                 else:
-                    sprites.add(sprite)
+                    sprite.item = item
+            elif sprite.name == 'king':
+                if not game_data['talked to king']:
+                    sprite.item = game_data['king item']
+            else:
+                sprite.item = item
+            sprite.battle = battle
+            self.assign_dialogue(sprite, properties)
+            self.check_for_opened_chest(sprite)
+            if (
+                    sprite.name == 'evilwizard' and
+                    game_data['crown quest']):
+                pass
+            else:
+                sprites.add(sprite)
 
         return sprites
 
@@ -349,13 +382,12 @@ class LevelState(tools.State):
         """
         portal_group = pg.sprite.Group()
 
-        for obj in self.renderer.tmx_data.get_objects():
+        for obj in self.renderer.tmx_data.objects_named('portal'):
             properties = obj.__dict__
-            if properties['name'] == 'portal':
-                posx = properties['x'] * 2
-                posy = (properties['y'] * 2) - 32
-                new_state = properties['type']
-                portal_group.add(portal.Portal(posx, posy, new_state))
+            posx = properties['x'] * 2
+            posy = (properties['y'] * 2) - 32
+            new_state = properties['type']
+            portal_group.add(portal.Portal(posx, posy, new_state))
 
         return portal_group
 
@@ -365,7 +397,10 @@ class LevelState(tools.State):
         """
         self.check_for_dialogue()
         self.player.update()
-        self.sprites.update()
+        self.update_sleeping_sprites()
+        self.awake_sprites.update()
+        if self.crowd is not None:
+            self.crowd.update(self.activity_rect())
         self.collision_handler.update()
         self.check_for_battle()
         self.check_for_portals()
@@ -375,6 +410,40 @@ class LevelState(tools.State):
         self.viewport_update()
         self.draw_level()
 
+    def activity_rect(self):
+        """
+        Area around the viewport in which sprites are awake.
+        """
+        return self.viewport.inflate(c.NPC_ACTIVE_MARGIN * 2,
+                                     c.NPC_ACTIVE_MARGIN * 2)
+
+    def update_sleeping_sprites(self):
+        """
+        Put the sprites that left the activity rect to sleep and wake up
+        the ones that came back.  Sleeping sprites count the frames they
+        miss and catch up on them every c.NPC_SLEEP_FRAMES frames, and when
+        they wake up, so where they are depends only on the frame count.
+        """
+        area = self.activity_rect()
+        self.frame_count += 1
+        tick = self.frame_count % c.NPC_SLEEP_FRAMES == 0
+        catch_up = self.collision_handler.catch_up
+
+        for sprite in self.solo_sprites:
+            if sprite.rect.colliderect(area):
+                if sprite in self.sleep_frames:
+                    catch_up(sprite, self.sleep_frames.pop(sprite))
+                    self.awake_sprites.add(sprite)
+                continue
+
+            if sprite not in self.sleep_frames:
+                self.awake_sprites.remove(sprite)
+                self.sleep_frames[sprite] = 0
+            self.sleep_frames[sprite] += 1
+            if tick:
+                catch_up(sprite, self.sleep_frames[sprite])
+                self.sleep_frames[sprite] = 0
+
     def check_for_portals(self):
         """
         Check if the player walks into a door, requiring a level change.
@@ -506,16 +575,27 @@ class LevelState(tools.State):
 
     def draw_level(self):
         """
-        Blit all images to screen.
+        Blit all images to screen, in screen coordinates: everything is
+        moved by the camera offset of the viewport.
         """
 
+        if not setup.drawing():
+            return
+
         surface = setup.screen()
+        dirty = setup.dirty_rects()
+        offset = (-self.viewport.x, -self.viewport.y)
+
+        # a scrolling camera changes the whole screen
+        self.map_chunks.draw(surface, self.viewport, (0, 0))
+        dirty.mark('map', surface.get_rect(),
+                   (self.map_chunks, tuple(self.viewport)))
 
-        self.level_surface.blit(self.map_image, self.viewport, self.viewport)
-        self.level_surface.blit(self.player.image, self.player.rect)
-        self.sprites.draw(self.level_surface)
+        dirty.blit('player', self.player.image, self.player.rect.move(offset))
+        for sprite in self.sprites:
+            if sprite.rect.colliderect(self.viewport):
+                dirty.blit(sprite, sprite.image, sprite.rect.move(offset))
 
-        surface.blit(self.level_surface, (0, 0), self.viewport)
         self.dialogue_handler.draw()
 
 def make_viewport(map_image):
@@ -1,6 +1,6 @@
-import pickle, os
+import time
 import pygame as pg
-from .. import setup, tools, tilerender
+from .. import setup, tools, tilerender, savefile
 from .. import observer
 from .. import constants as c
 from . import death
@@ -8,6 +8,8 @@ from . import death
 from .levels import make_viewport
 
 class Menu(tools.State):
+    assets = ('title_box',)
+
     def __init__(self):
         super(Menu, self).__init__()
 
@@ -60,6 +62,9 @@ class Menu(tools.State):
         Blit tmx map and title box onto screen.
         """
 
+        if not setup.drawing():
+            return
+
         surface = setup.screen()
 
         self.level_surface.blit(self.map_image, self.viewport, self.viewport)
@@ -80,6 +85,8 @@ class Instructions(tools.State):
     """
     Instructions page.
     """
+    assets = ('instructions_box',)
+
     def __init__(self):
         super(Instructions, self).__init__()
 
@@ -150,6 +157,9 @@ class Instructions(tools.State):
         Blit tmx map and title box onto screen.
         """
 
+        if not setup.drawing():
+            return
+
         surface = setup.screen()
 
         self.level_surface.blit(self.map_image, self.viewport, self.viewport)
@@ -176,8 +186,11 @@ def set_next_scene():
     Was a method of Instructions; uses no 'self'
 
     """
-    if not os.path.isfile("save.p"):
+    slots = setup.save_slots()
+    setup.saver().flush()
+    if not slots.index():
         next_scene = c.OVERWORLD
+        slots.current = slots.free_slot()
     else:
         next_scene = c.LOADGAME
 
@@ -185,11 +198,59 @@ def set_next_scene():
 
 
 class LoadGame(Instructions):
+    """
+    Load a saved game, picked with left and right among the save slots,
+    or start a new one.  With every slot in use, a new game goes in the
+    slot picked, once the player pressed space a second time to give it up.
+    """
+    assets = ('loadgamebox', 'smallarrow')
+
     def __init__(self):
         super(LoadGame, self).__init__()
         self.arrow = death.Arrow(200, 260)
         self.arrow.pos_list[1] += 34
         self.allow_input = False
+        self.font = pg.font.Font(setup.FONTS[c.MAIN_FONT], 22)
+        self.saves = []
+        self.save_index = 0
+        self.save_text = None
+        self.damaged = set()
+        # the slot a new game would overwrite, until confirmed
+        self.overwrite = None
+
+    def startup(self):
+        super(LoadGame, self).startup()
+        # the index is enough to list the slots, none is loaded yet
+        slots = setup.save_slots()
+        self.saves = slots.index()
+        latest = slots.latest()
+        self.save_index = [info.slot for info in self.saves].index(latest)
+        self.overwrite = None
+        self.save_text = self.make_save_text()
+
+    def make_save_text(self):
+        """
+        Render the slot picked: its number, what the player had and
+        where, and when it was saved.
+        """
+        info = self.saves[self.save_index]
+        lines = ['Slot {0}: level {1}, {2} gold, {3}'.format(
+                     info.slot, info.level, info.gold, info.place.title()),
+                 time.strftime('%d %b %Y %H:%M',
+                               time.localtime(info.saved))]
+        if info.slot in self.damaged:
+            lines[1] = 'This save is damaged'
+        if info.slot == self.overwrite:
+            lines[1] = 'Space again to start over in this slot'
+        if len(self.saves) > 1:
+            lines[0] = '< {0} >'.format(lines[0])
+
+        surface = pg.Surface((self.title_rect.width, 60), pg.SRCALPHA)
+        for i, line in enumerate(lines):
+            text = self.font.render(line, True, c.NEAR_BLACK)
+            surface.blit(text, text.get_rect(centerx=surface.get_width() // 2,
+                                             y=i * 30))
+        return surface
 
     def set_image(self):
         """
@@ -197,8 +258,13 @@ class LoadGame(Instructions):
         """
         return setup.gfx()['loadgamebox']
 
+    def likely_next(self):
+        return [c.TOWN, c.OVERWORLD]
+
     def draw_arrow(self):
         self.level_surface.blit(self.arrow.image, self.arrow.rect)
+        self.level_surface.blit(self.save_text, (self.title_rect.x,
+                                                 self.title_rect.y + 130))
 
     def get_event(self, event):
         pass
@@ -214,23 +280,59 @@ class LoadGame(Instructions):
                 self.allow_input = False
             elif keys[pg.K_UP] and self.arrow.index == 1:
                 self.arrow.index = 0
+                self.cancel_overwrite()
+                self.notify(c.CLICK)
+                self.allow_input = False
+            elif (keys[pg.K_LEFT] or keys[pg.K_RIGHT]) and \
+                    len(self.saves) > 1:
+                step = 1 if keys[pg.K_RIGHT] else -1
+                self.save_index = (self.save_index + step) % len(self.saves)
+                self.overwrite = None
+                self.save_text = self.make_save_text()
                 self.notify(c.CLICK)
                 self.allow_input = False
             elif keys[pg.K_SPACE]:
+                slots = setup.save_slots()
                 if self.arrow.index == 0:
-
-                    with open("save.p", "rb") as save_file:
-                        setup.register_game_data(pickle.load(save_file))
+                    slot = self.saves[self.save_index].slot
+                    if slot in self.damaged:
+                        return
+                    setup.saver().flush()
+                    try:
+                        setup.register_game_data(slots.load(slot))
+                    except savefile.SaveError as error:
+                        print(error)
+                        self.damaged.add(slot)
+                        self.save_text = self.make_save_text()
+                        return
+                    slots.current = slot
 
                     self.next = c.TOWN
                     self.state = c.TRANSITION_OUT
                 else:
+                    slot = slots.free_slot()
+                    if slot is None:
+                        # every slot is in use: ask before overwriting one
+                        slot = self.saves[self.save_index].slot
+                        if self.overwrite != slot:
+                            self.overwrite = slot
+                            self.save_text = self.make_save_text()
+                            self.notify(c.CLICK)
+                            self.allow_input = False
+                            return
+                    slots.current = slot
                     self.next = c.OVERWORLD
                     self.state = c.TRANSITION_OUT
                 self.notify(c.CLICK2)
 
             self.arrow.rect.y = self.arrow.pos_list[self.arrow.index]
 
-        if not keys[pg.K_DOWN] and not keys[pg.K_UP]:
+        if not (keys[pg.K_DOWN] or keys[pg.K_UP] or keys[pg.K_LEFT] or
+                keys[pg.K_RIGHT] or keys[pg.K_SPACE]):
             self.allow_input = True
 
+    def cancel_overwrite(self):
+        if self.overwrite is not None:
+            self.overwrite = None
+            self.save_text = self.make_save_text()
+
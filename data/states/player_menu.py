@@ -42,9 +42,10 @@ class PlayerMenu(tools.State):
         self.draw()
 
     def draw(self):
+        if not setup.drawing():
+            return
 
-        surface = setup.screen()
-
-        surface.blit(self.background.image, self.background.rect)
+        setup.dirty_rects().blit('background', self.background.image,
+                                 self.background.rect)
         self.gui.draw()
 
@@ -160,6 +160,9 @@ class Credits(tools.State):
         Draw all graphics to the window surface.
         """
 
+        if not setup.drawing():
+            return
+
         surface = setup.screen()
 
         surface.blit(self.background, (0, 0))
@@ -14,6 +14,9 @@ from .. import constants as c
 
 class Shop(tools.State):
     """Basic shop state"""
+    assets = ('house', 'player', 'dialoguebox', 'fancyarrow', 'goldbox',
+              'shopbox')
+
     def __init__(self):
         super(Shop, self).__init__()
 
@@ -100,9 +103,11 @@ class Shop(tools.State):
         Blit graphics to game surface.
         """
 
-        surface = setup.screen()
+        if not setup.drawing():
+            return
 
-        surface.blit(self.background.image, self.background.rect)
+        setup.dirty_rects().blit('background', self.background.image,
+                                 self.background.rect)
         self.gui.draw()
 
 
@@ -110,6 +115,8 @@ class Inn(Shop):
     """
     Where our hero gets rest.
     """
+    assets = Shop.assets + ('innman',)
+
     def __init__(self):
         super(Inn, self).__init__()
         self.name = c.INN
@@ -130,6 +137,8 @@ class Inn(Shop):
 
 class WeaponShop(Shop):
     """A place to buy weapons"""
+    assets = Shop.assets + ('weaponman',)
+
     def __init__(self):
         super(WeaponShop, self).__init__()
         self.name = c.WEAPON_SHOP
@@ -143,6 +152,8 @@ class WeaponShop(Shop):
 
 class ArmorShop(Shop):
     """A place to buy armor"""
+    assets = Shop.assets + ('armorman',)
+
     def __init__(self):
         super(ArmorShop, self).__init__()
         self.name = c.ARMOR_SHOP
@@ -157,6 +168,8 @@ class ArmorShop(Shop):
 
 class MagicShop(Shop):
     """A place to buy magic"""
+    assets = Shop.assets + ('magiclady',)
+
     def __init__(self):
         super(MagicShop, self).__init__()
         self.name = c.MAGIC_SHOP
@@ -171,6 +184,8 @@ class MagicShop(Shop):
 
 class PotionShop(Shop):
     """A place to buy potions"""
+    assets = Shop.assets + ('potionlady',)
+
     def __init__(self):
         super(PotionShop, self).__init__()
         self.name = c.POTION_SHOP
@@ -1,9 +1,44 @@
 """
 This is a test of using the pytmx library with Tiled.
 """
+import os
+
 import pygame as pg
 
 from . import pytmx
+from .pytmx.tmxloader import surface_bytes
+from .pytmx.utils import LRUCache
+from . import constants as c
+
+# finished (scaled) map surfaces and map chunks, shared by every Renderer of
+# the same map so going back to a recently visited level renders no tiles;
+# keyed by (map file, map mtime, render settings).  The cached surfaces are
+# shared, so they must not be drawn on.
+MAP_CACHE = LRUCache(c.MAP_CACHE_BUDGET, surface_bytes)
+
+# bytes a compiled blit takes, besides its tile
+BLIT_BYTES = 64
+
+
+def blits_bytes(layers):
+    """
+    Memory held by compiled blits: the blits, and every tile they use.  The
+    tiles stay alive as long as the blits do, even once tmxloader's
+    TILE_CACHE has dropped them, so they count here; a tile used by several
+    entries counts in each.
+    """
+    tiles = {}
+    count = 0
+    for blits in layers:
+        count += len(blits)
+        for tile, _ in blits:
+            tiles[id(tile)] = tile
+    return count * BLIT_BYTES + sum(surface_bytes(tile)
+                                    for tile in tiles.values())
+
+# the tiles of a map area compiled into one (surface, dest) sequence per
+# layer, ready for Surface.blits; keyed like MAP_CACHE plus the area
+BLIT_CACHE = LRUCache(c.BLIT_CACHE_BUDGET, blits_bytes)
 
 
 class Renderer(object):
@@ -17,30 +52,86 @@ class Renderer(object):
     """
 
     def __init__(self, filename):
-        tilemap = pytmx.load_pygame(filename, pixelalpha=True)
+        self.pixelalpha = True
+        tilemap = pytmx.load_pygame(filename, pixelalpha=self.pixelalpha)
         self.size = (
             tilemap.width * tilemap.tilewidth,
             tilemap.height * tilemap.tileheight)
         print(filename, tilemap.width, tilemap.height, tilemap.tilewidth,
               tilemap.tileheight)
+        self.filename = filename
+        # the map file as loaded, for the cache keys
+        self.path = os.path.abspath(filename)
+        self.mtime = os.path.getmtime(self.path)
         self.tmx_data = tilemap
 
     def render(self, surface):
+        self.render_area(surface, pg.Rect((0, 0), self.size))
+
+    def render_area(self, surface, area):
+        """
+        Render the part of the map inside 'area' (in map pixels) with its
+        top left corner at the top left of 'surface'
+        """
+
+        if self.tmx_data.background_color:
+            surface.fill(self.tmx_data.background_color)
+
+        for blits in self.get_blits(area):
+            surface.blits(blits, doreturn=False)
+
+    def get_blits(self, area):
+        """
+        Return the compiled blit sequences of 'area', from BLIT_CACHE if the
+        same area of this map was rendered before
+        """
+        key = self.cache_key('blits') + tuple(area)
+        layers = BLIT_CACHE.get(key)
+
+        if layers is None:
+            layers = self.compile_blits(area)
+            BLIT_CACHE.put(key, layers)
+
+        return layers
+
+    def compile_blits(self, area):
+        """
+        Compile the visible layers of the map inside 'area' into one tuple
+        of (surface, dest) pairs each, with dest relative to the top left of
+        'area'.  Empty tiles are left out.
+        """
 
         tile_width = self.tmx_data.tilewidth
         tile_height = self.tmx_data.tileheight
         get_tile = self.tmx_data.get_tile_image_by_gid
 
-        if self.tmx_data.background_color:
-            surface.fill(self.tmx_data.background_color)
+        first_x = area.left // tile_width
+        first_y = area.top // tile_height
+        last_x = min(-(-area.right // tile_width), self.tmx_data.width)
+        last_y = min(-(-area.bottom // tile_height), self.tmx_data.height)
+
+        # the same few gids come up over and over
+        tiles = {}
 
+        layers = []
         for layer in self.tmx_data.visible_layers:
             if isinstance(layer, pytmx.TiledLayer):
-                for tile_x, tile_y, gid in layer:
-                    tile = get_tile(gid)
-                    if tile:
-                        surface.blit(
-                            tile, (tile_x * tile_width, tile_y * tile_height))
+                blits = []
+                for tile_y in range(first_y, last_y):
+                    row = layer.data[tile_y]
+                    dest_y = tile_y * tile_height - area.top
+                    for tile_x in range(first_x, last_x):
+                        gid = int(row[tile_x])
+                        if not gid:
+                            continue
+                        if gid not in tiles:
+                            tiles[gid] = get_tile(gid)
+                        tile = tiles[gid]
+                        if tile:
+                            blits.append(
+                                (tile, (tile_x * tile_width - area.left,
+                                        dest_y)))
+                layers.append(tuple(blits))
 
             elif isinstance(layer, pytmx.TiledObjectGroup):
                 pass
@@ -48,11 +139,145 @@ class Renderer(object):
             elif isinstance(layer, pytmx.TiledImageLayer):
                 image = get_tile(layer.gid)
                 if image:
-                    surface.blit(image, (0, 0))
+                    layers.append(((image, (-area.left, -area.top)),))
+
+        return layers
+
+    def cache_key(self, mode):
+        """
+        Key of this map rendered with 'mode' in MAP_CACHE
+        """
+        return self.path, self.mtime, mode, self.pixelalpha
 
     def make_2x_map(self):
-        temp_surface = pg.Surface(self.size)
-        self.render(temp_surface)
-        temp_surface = pg.transform.scale2x(temp_surface)
-        return temp_surface
+        """
+        Return the whole map rendered and scaled 2x, from MAP_CACHE if
+        it was rendered recently; don't draw on it
+        """
+        key = self.cache_key('scale2x')
+        surface = MAP_CACHE.get(key)
+
+        if surface is None:
+            temp_surface = pg.Surface(self.size)
+            self.render(temp_surface)
+            surface = pg.transform.scale2x(temp_surface)
+            MAP_CACHE.put(key, surface)
+
+        return surface
+
+    def make_2x_chunks(self):
+        """
+        Return the map rendered and scaled 2x as a ChunkedMap
+        """
+        return ChunkedMap(self)
+
+
+class ChunkedMap(object):
+    """
+    A map rendered and scaled 2x in square chunks.  Chunks are rendered the
+    first time they are drawn, into MAP_CACHE, which keeps them within its
+    byte budget however large the map is.  The chunks near the viewport
+    are held on to as well, so they are never evicted while on screen;
+    farther ones are left to MAP_CACHE, and are only rendered again if it
+    dropped them.
+    """
+
+    def __init__(self, renderer, chunk_size=c.MAP_CHUNK_SIZE,
+                 margin=c.MAP_CHUNK_MARGIN):
+        self.renderer = renderer
+        self.chunk_size = chunk_size
+        self.margin = margin
+        self.size = renderer.size[0] * 2, renderer.size[1] * 2
+        self.key = renderer.cache_key('scale2x chunk')
+
+        # chunks drawn recently; (column, row): surface
+        self.chunks = {}
+
+    def get_rect(self):
+        return pg.Rect((0, 0), self.size)
+
+    def chunk_rect(self, column, row):
+        """
+        Area of a chunk in (2x) map pixels
+        """
+        rect = pg.Rect(column * self.chunk_size, row * self.chunk_size,
+                       self.chunk_size, self.chunk_size)
+        return rect.clip(pg.Rect((0, 0), self.size))
+
+    def chunks_in(self, area):
+        """
+        (column, row) of every chunk overlapping 'area'
+        """
+        area = area.clip(pg.Rect((0, 0), self.size))
+        first_column = area.left // self.chunk_size
+        first_row = area.top // self.chunk_size
+        last_column = (area.right - 1) // self.chunk_size
+        last_row = (area.bottom - 1) // self.chunk_size
+
+        return [(column, row)
+                for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
+
+    def render_chunk(self, column, row):
+        """
+        Render a chunk at 1x and scale it 2x.
+
+        scale2x looks at the neighbours of each pixel, so one extra tile is
+        rendered around the chunk (within the map) and cut away after
+        scaling; that way chunks match the whole map scaled at once.
+        """
+        rect = self.chunk_rect(column, row)
+        area = pg.Rect(rect.x // 2, rect.y // 2, rect.width // 2,
+                       rect.height // 2)
+        border = max(self.renderer.tmx_data.tilewidth,
+                     self.renderer.tmx_data.tileheight)
+        padded = area.inflate(border * 2, border * 2).clip(
+            pg.Rect((0, 0), self.renderer.size))
+
+        temp_surface = pg.Surface(padded.size)
+        self.renderer.render_area(temp_surface, padded)
+        scaled = pg.transform.scale2x(temp_surface)
+
+        crop = pg.Rect((area.x - padded.x) * 2, (area.y - padded.y) * 2,
+                       rect.width, rect.height)
+        return scaled.subsurface(crop).copy()
+
+    def get_chunk(self, column, row):
+        chunk = self.chunks.get((column, row))
+        if chunk is None:
+            key = self.key + (self.chunk_size, column, row)
+            chunk = MAP_CACHE.get(key)
+            if chunk is None:
+                chunk = self.render_chunk(column, row)
+                MAP_CACHE.put(key, chunk)
+            self.chunks[(column, row)] = chunk
+        return chunk
+
+    def drop_far_chunks(self, viewport):
+        """
+        Let go of the chunks farther than 'margin' from the viewport; they
+        stay in MAP_CACHE until it needs the room
+        """
+        near = set(self.chunks_in(viewport.inflate(self.margin * 2,
+                                                   self.margin * 2)))
+        for position in list(self.chunks):
+            if position not in near:
+                del self.chunks[position]
+
+    def draw(self, surface, viewport, dest=None):
+        """
+        Blit the part of the map inside 'viewport' to 'surface', with the
+        viewport's top left corner at 'dest' (by default, at its own
+        position, i.e. in map coordinates)
+        """
+        if dest is None:
+            dest = viewport.topleft
+        offset_x = dest[0] - viewport.x
+        offset_y = dest[1] - viewport.y
+
+        self.drop_far_chunks(viewport)
 
+        for column, row in self.chunks_in(viewport):
+            rect = self.chunk_rect(column, row)
+            surface.blit(self.get_chunk(column, row),
+                         (rect.x + offset_x, rect.y + offset_y))
@@ -6,10 +6,21 @@ Control, state, loaders
 
 __author__ = 'justinarmstrong'
 
+import time
 import pygame as pg
 from . import constants as c
 from . import setup
 
+def get_ticks():
+    """
+    Milliseconds of game time: real time, or the virtual clock's time in
+    headless runs
+    """
+    clock = setup.clock()
+    if clock is None:
+        return pg.time.get_ticks()
+    return clock.get_ticks()
+
 class Timer(object):
     """
     Is initialized with a number of milliseconds, answers "done" when that
@@ -19,16 +30,90 @@ class Timer(object):
 
     def __init__(self, milliseconds):
         self.milliseconds = milliseconds
-        self.start_time = pg.time.get_ticks()
+        self.start_time = get_ticks()
 
     def done(self, target=None):
         if target is None:
-            return (pg.time.get_ticks() - self.start_time) > self.milliseconds
+            return (get_ticks() - self.start_time) > self.milliseconds
         else:
-            return (pg.time.get_ticks() - self.start_time) > target
+            return (get_ticks() - self.start_time) > target
 
     def reset(self):
-        self.start_time = pg.time.get_ticks()
+        self.start_time = get_ticks()
+
+class VirtualClock(object):
+    """
+    Stands in for pg.time.Clock in headless runs: every tick moves the game
+    time on by one frame, without waiting, so the game runs as fast as it
+    can while the Timers see it run at 'framerate'.
+
+    With 'real_time' it also waits like pg.time.Clock does: the game runs
+    at the normal speed, but its time still goes by in whole frames, the
+    same on every run (for recording and replaying input).
+    """
+
+    def __init__(self, real_time=False):
+        self.time = 0.0
+        self.real_clock = pg.time.Clock() if real_time else None
+
+    def tick(self, framerate=c.FPS):
+        if self.real_clock is not None:
+            self.real_clock.tick(framerate)
+        frame_time = 1000.0 / framerate
+        self.time += frame_time
+        return int(frame_time)
+
+    def get_ticks(self):
+        return int(self.time)
+
+class StateRegistry(object):
+    """
+    The pool of states, by name: 'factories' maps every name to what
+    makes the state (a State class, or a functools.partial of one), and a
+    state is made the first time it's looked up, then kept.  How long
+    each one took is in 'build_times'; with 'log' on, it's printed too.
+    """
+    def __init__(self, factories):
+        self.factories = factories
+        self.states = {}
+        # (name, seconds, why) of every state built
+        self.build_times = []
+        self.log = False
+
+    def __contains__(self, name):
+        return name in self.factories
+
+    def __iter__(self):
+        return iter(self.factories)
+
+    def __len__(self):
+        return len(self.factories)
+
+    def __getitem__(self, name):
+        state = self.states.get(name)
+        if state is None:
+            state = self.build(name, 'needed')
+        return state
+
+    def built(self, name):
+        return name in self.states
+
+    def state_class(self, name):
+        """ The class of the state 'name', built or not """
+        factory = self.factories[name]
+        return getattr(factory, 'func', factory)
+
+    def build(self, name, why):
+        start = time.perf_counter()
+        state = self.factories[name]()
+        seconds = time.perf_counter() - start
+        self.states[name] = state
+        self.build_times.append((name, seconds, why))
+        if self.log:
+            print('Built the state {0!r} in {1:.1f} ms ({2})'.format(
+                name, seconds * 1000, why))
+        return state
+
 
 class Control(object):
     """
@@ -41,28 +126,50 @@ class Control(object):
         # stop condition
         self.quit = False
 
-        # clock
-        self.clock = pg.time.Clock()
+        # clock; headless runs register a VirtualClock
+        self.clock = setup.clock() or pg.time.Clock()
+        self.frame_count = 0
+
+        # input recording and replay (see replay.py); the time each frame
+        # took, if 'frame_times' is a list
+        self.recorder = None
+        self.replayer = None
+        self.frame_times = None
 
         # 'setup.keys()' keeps a global key state; it's updated
         # with update_keys
         setup.update_keys()
 
+        # what the states draw is recorded in 'setup.dirty_rects()', so
+        # only the parts of the screen that changed are sent to the display
+        self.dirty_rects = DirtyRects(setup.screen())
+        setup.register_dirty_rects(self.dirty_rects)
+
         # (derived from) State
         # .state is the .state_name'ish member of .state_dict
         self.state_dict = {}
         self.state_name = None
         self.state = None
 
+        # with 'warm_up' on, the states the current one may lead to are
+        # built ahead of time, one a frame, while it fades in
+        self.warm_up = False
+        self.warm_up_queue = []
+
     def setup_states(self, state_dict, start_state):
-        """ Set the pool of states and choose one; because of the choosing,
-        make sure its music is set
+        """ Set the pool of states, a StateRegistry, and choose one;
+        because of the choosing, make sure its music is set
 
         """
 
         self.state_dict = state_dict
         self.state_name = start_state
         self.state = self.state_dict[self.state_name]
+        self.plan_warm_up()
+
+        # what the other states draw is loaded while the first one runs
+        for name in sorted(self.state_dict):
+            setup.gfx().prefetch(self.state_dict.state_class(name).assets)
 
         #self.set_music()
 
@@ -100,9 +207,28 @@ class Control(object):
         # initialize the new state
         self.state.startup()
         setup.mixer().play(self.state.name)
+        self.plan_warm_up()
+
+    def plan_warm_up(self):
+        """ Queue the states the current one may lead to, not built yet """
+        if self.warm_up:
+            self.warm_up_queue = [
+                name for name in self.state.likely_next()
+                if name in self.state_dict and
+                not self.state_dict.built(name)]
+
+    def warm_up_state(self):
+        """ Build the next state of the warm-up queue, if any """
+        while self.warm_up_queue:
+            name = self.warm_up_queue.pop(0)
+            if not self.state_dict.built(name):
+                self.state_dict.build(name, 'warm-up')
+                return
 
     def event_loop(self):
         events = pg.event.get()
+        if self.replayer is not None:
+            events = self.replayer.replay_frame(events)
 
         for event in events:
             if event.type == pg.QUIT:
@@ -115,16 +241,147 @@ class Control(object):
 
             self.state.get_event(event)
 
-    def main(self):
-        """Main loop for entire program"""
+        if self.recorder is not None:
+            self.recorder.record(setup.keys())
+
+    def update_display(self):
+        """ Send the parts of the screen drawn differently than in the last
+        frame to the display, or the whole screen if the state doesn't say
+
+        """
+
+        rects = self.dirty_rects.end_frame()
+        if rects is None:
+            pg.display.update()
+        elif rects:
+            pg.display.update(rects)
+
+    def main(self, frames=None):
+        """Main loop for entire program; stops after 'frames' frames, if
+        given
+
+        """
         while not self.quit:
+            start = time.perf_counter()
             self.event_loop()
             self.update()
-            pg.display.update()
+            self.warm_up_state()
+            if setup.drawing():
+                self.update_display()
+            if self.frame_times is not None:
+                self.frame_times.append(time.perf_counter() - start)
             self.clock.tick(c.FPS)
 
+            self.frame_count += 1
+            if self.frame_count == frames:
+                self.quit = True
+
+class DirtyRects(object):
+    """
+    Keeps track of what is drawn on the screen, to find the regions that
+    changed since the previous frame.
+
+    Everything drawn is recorded under a key; if the image drawn under a
+    key, or where it is drawn, differs from the last frame, both the old and
+    the new rect are dirty.  Images are compared by identity, alpha and
+    colorkey, never by their pixels: a sprite that changes its image
+    switches to another surface.  A box rebuilt every frame is a new surface
+    every frame, so it comes with its 'content', whatever it was made from,
+    which is compared instead.  A frame in which nothing was recorded comes
+    from a state that doesn't keep track of its drawing and is updated as a
+    whole, and so is the frame after it.
+
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.screen_rect = surface.get_rect()
+        self.previous = {}
+        self.current = {}
+
+    def blit(self, key, image, rect, content=None):
+        """ Blit 'image' on the screen and record it under 'key' """
+        self.surface.blit(image, rect)
+        self.record(key, image, rect, content)
+
+    def draw_group(self, key, group):
+        """ Same as group.draw on the screen, recording each sprite """
+        for sprite in group.sprites():
+            self.blit((key, sprite), sprite.image, sprite.rect)
+
+    def record(self, key, image, rect, content=None):
+        """
+        Record that 'image' was drawn at 'rect' by other means; an image
+        made from 'content' is the same as any other image made from it
+        """
+        if content is None:
+            content = image
+        content = (content, image.get_alpha(), image.get_colorkey())
+        self.mark(key, pg.Rect(rect[0], rect[1], *image.get_size()), content)
+
+    def mark(self, key, rect, content):
+        """
+        Record a drawing of 'rect' that is unchanged as long as 'content'
+        compares equal
+        """
+        # the drawing order matters where images overlap
+        self.current[key] = (pg.Rect(rect), content, len(self.current))
+
+    def end_frame(self):
+        """
+        Return the merged rects that changed since the previous frame, or None
+        if the whole screen must be updated; start recording the next frame
+        """
+
+        previous, current = self.previous, self.current
+        self.previous, self.current = current, {}
+
+        if not previous or not current:
+            return None
+
+        dirty = []
+        for key, (rect, content, order) in current.items():
+            if key not in previous:
+                dirty.append(rect)
+            elif previous[key] != (rect, content, order):
+                dirty.append(previous[key][0])
+                dirty.append(rect)
+        for key, (rect, content, order) in previous.items():
+            if key not in current:
+                dirty.append(rect)
+
+        return merge_rects(dirty, self.screen_rect)
+
+def merge_rects(rects, bounds):
+    """
+    Clip 'rects' to 'bounds' and merge the overlapping ones; if they cover
+    most of 'bounds', just return 'bounds'
+    """
+
+    merged = []
+    for rect in rects:
+        rect = rect.clip(bounds)
+        if not rect.width or not rect.height:
+            continue
+        # grow the rect with everything it touches until nothing does
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+
+    area = sum(rect.width * rect.height for rect in merged)
+    if area * 4 > bounds.width * bounds.height * 3:
+        return [bounds]
+    return merged
+
 class State(object):
     """Base class for all game states"""
+
+    # names of the images of setup.gfx() the state draws, loaded in the
+    # background before it's needed
+    assets = ()
+
     def __init__(self):
         self.done = False
 
@@ -152,6 +409,12 @@ class State(object):
     def update(self):
         pass
 
+    def likely_next(self):
+        """
+        Names of the states this one may lead to, the likeliest first
+        """
+        return [self.next] if self.next else []
+
     def make_state_dict(self):
         """
         Make the dicitonary of state methods for the scene.
@@ -253,9 +516,9 @@ def notify_observers(self, event):
     for each_observer in self.observers:
         each_observer.on_notify(event)
 
-def create_game_data_dict():
-    """Create a dictionary of persistant values the player
-    carries between states"""
+def new_game_data():
+    """Return the dictionary of persistant values the player
+    carries between states, as they are at the start of a new game"""
 
     player_items = {'GOLD': dict([('quantity', 10000),
                                   ('value', 0)]),
@@ -309,7 +572,12 @@ def create_game_data_dict():
                  'delivered crown': False,
                  'brother item': 'ELIXIR'}
 
-    setup.register_game_data(data_dict)
+    return data_dict
+
+def create_game_data_dict():
+    """Create a dictionary of persistant values the player
+    carries between states"""
+    setup.register_game_data(new_game_data())
 
 def empty_background():
     """
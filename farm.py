@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+"""
+
+Replays and battle simulations on every core
+
+Plays a directory of replay files (see data/replay.py) on a pool of
+processes, each one running the game headless, and/or sweeps the battle
+balance simulator (data/balance.py) over a grid of parameters, and writes
+what came out into one JSON report: the frame times and the final game
+data of every replay, the figures of every simulation, and the traceback
+of anything that crashed.
+
+    python farm.py --replays sessions/ --report nightly.json
+    python farm.py --sweep level=1,2,3 area=overworld,dungeon5 \\
+        armor=,Chain+Mail
+
+Every worker saves the game in a directory of its own; a replay starts with
+no saves, or with a copy of the save slots of the directory given with
+--save.
+
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import TheStolenCrown
+from data.main import make_control
+from data import balance, replay, session, setup, tools
+
+# the directory a worker saves the game in
+WORK_DIR = None
+
+
+def init_worker(draw):
+    """
+    Start the game headless in a pool process
+    """
+    global WORK_DIR
+    WORK_DIR = tempfile.mkdtemp(prefix='farm-')
+    multiprocessing.util.Finalize(None, shutil.rmtree, (WORK_DIR, True),
+                                  exitpriority=0)
+    TheStolenCrown.init_game(headless=True, draw=draw, save_dir=WORK_DIR)
+
+
+def run_replay(path, frames=None, save=None, keep_frame_times=False):
+    """
+    Replay the file 'path' from a new game, up to 'frames' frames
+    """
+    replayer = replay.Replayer(path)
+    setup.register_session(session.Session(replayer.seed))
+    setup.register_clock(tools.VirtualClock())
+    setup.register_key_source(replayer.pressed)
+    for name in os.listdir(WORK_DIR):
+        os.remove(os.path.join(WORK_DIR, name))
+    if save is not None:
+        for name in os.listdir(save):
+            shutil.copy(os.path.join(save, name), WORK_DIR)
+    setup.save_slots().reload()
+
+    control = make_control()
+    control.replayer = replayer
+    control.frame_times = []
+    control.main(frames)
+    setup.saver().flush()
+
+    result = {'frames': control.frame_count,
+              'state': control.state_name,
+              'frame times': replay.frame_time_stats(control.frame_times),
+              'game data': setup.game_data()}
+    if keep_frame_times:
+        result['frame time list'] = control.frame_times
+    return result
+
+
+def run_battles(params, battles, seed):
+    """
+    Simulate 'battles' battles of the balance.Scenario made of 'params'
+    """
+    scenario = balance.Scenario(**params)
+    return balance.summary(balance.run(scenario, battles, seed))
+
+
+JOBS = {'replay': run_replay,
+        'battles': run_battles}
+
+
+def run_job(job):
+    """
+    Run one job, (kind, name, keyword arguments), in a pool process; a
+    crash is part of the result
+    """
+    kind, name, kwargs = job
+    result = {'kind': kind, 'name': name, 'ok': True}
+    start = time.perf_counter()
+    try:
+        result.update(JOBS[kind](**kwargs))
+    except Exception:
+        result['ok'] = False
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def replay_jobs(directory, frames, save, keep_frame_times):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.rep'):
+            yield ('replay', name,
+                   {'path': os.path.join(directory, name), 'frames': frames,
+                    'save': save, 'keep_frame_times': keep_frame_times})
+
+
+def parse_value(name, value):
+    """
+    A value of a --sweep parameter; the items of the armor and spells
+    lists are separated by ':', and '+' stands for a space
+    """
+    if name in ('armor', 'spells'):
+        return [item.replace('+', ' ') for item in value.split(':') if item]
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value.replace('+', ' ')
+
+
+def sweep_jobs(sweep, battles, seed):
+    """
+    One job per combination of the values of 'sweep', a list of
+    'name=value,value,...' strings
+    """
+    names = []
+    choices = []
+    for spec in sweep:
+        name, _, values = spec.partition('=')
+        names.append(name)
+        choices.append([parse_value(name, value)
+                        for value in values.split(',')])
+
+    for i, values in enumerate(itertools.product(*choices)):
+        params = dict(zip(names, values))
+        name = ' '.join('{0}={1}'.format(*item)
+                        for item in sorted(params.items()))
+        yield ('battles', name,
+               {'params': params, 'battles': battles,
+                'seed': session.stream_seed(seed, i)})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Run replays and battle simulations on every core')
+    parser.add_argument('--replays', metavar='DIR',
+                        help='play every .rep file of a directory')
+    parser.add_argument('--frames', type=int,
+                        help='stop every replay after this many frames')
+    parser.add_argument('--save', metavar='DIR',
+                        help='save slots the replays start with')
+    parser.add_argument('--draw', action='store_true',
+                        help='draw the replays (their frame times count '
+                             'the drawing then)')
+    parser.add_argument('--frame-times', action='store_true',
+                        help='keep the time of every frame in the report')
+    parser.add_argument('--sweep', nargs='+', metavar='NAME=VALUES',
+                        default=[],
+                        help='balance.Scenario parameters to simulate, '
+                             'every combination; armor and spells items '
+                             'are separated by ":"')
+    parser.add_argument('--battles', type=int, default=100000,
+                        help='battles per simulation')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int,
+                        help='default: one per core')
+    parser.add_argument('--report', metavar='FILE', default='farm.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    jobs = []
+    if args.replays:
+        jobs.extend(replay_jobs(args.replays, args.frames, args.save,
+                                args.frame_times))
+    if args.sweep:
+        jobs.extend(sweep_jobs(args.sweep, args.battles, args.seed))
+    if not jobs:
+        sys.exit('nothing to do: give --replays and/or --sweep')
+
+    start = time.perf_counter()
+    results = []
+    pool = multiprocessing.Pool(args.processes, init_worker, (args.draw,))
+    try:
+        for result in pool.imap_unordered(run_job, jobs):
+            results.append(result)
+            print('[{0}/{1}] {2} {3}: {4} ({5:.2f} s)'.format(
+                len(results), len(jobs), result['kind'], result['name'],
+                'ok' if result['ok'] else 'CRASHED', result['seconds']))
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda result: (result['kind'], result['name']))
+    crashed = [result for result in results if not result['ok']]
+    report = {'jobs': len(results),
+              'crashed': len(crashed),
+              'seconds': elapsed,
+              'results': results}
+    with open(args.report, 'w') as report_file:
+        json.dump(report, report_file, indent=1, sort_keys=True,
+                  default=repr)
+
+    for result in crashed:
+        print('== {0} {1}'.format(result['kind'], result['name']))
+        print(result['error'])
+    print('{0} jobs, {1} crashed, in {2:.2f} s; report in {3}'.format(
+        len(results), len(crashed), elapsed, args.report))
+
+
+if __name__ == '__main__':
+    main()